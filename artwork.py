@@ -0,0 +1,275 @@
+"""Cache of the artwork shown by KEF speakers, in memory and on disk."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from functools import partial
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, NamedTuple
+
+import aiohttp
+from aiohttp import hdrs
+
+from homeassistant.core import HomeAssistant
+import homeassistant.helpers.aiohttp_client as hass_aiohttp
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Bytes of artwork kept in memory and on disk, 0 disables the disk.
+ARTWORK_MEMORY_BYTES = 8 * 1024 * 1024
+ARTWORK_DISK_BYTES = 64 * 1024 * 1024
+
+# Seconds before cached artwork is revalidated with its origin, and seconds to wait
+# for the origin to answer.
+ARTWORK_REVALIDATE_INTERVAL = 300
+ARTWORK_TIMEOUT = 10
+
+DATA_ARTWORK = f"{DOMAIN}_artwork"
+
+
+class Artwork(NamedTuple):
+    """Image and the validators to revalidate it with its origin."""
+
+    content: bytes
+    content_type: str | None
+    digest: str
+    etag: str | None
+    last_modified: str | None
+    validated_at: float
+
+
+def url_key(url: str) -> str:
+    """Key of an url, the same hash Home Assistant uses for media images by default."""
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+
+async def async_get_artwork_cache(hass: HomeAssistant) -> ArtworkCache:
+    """Artwork cache shared by all speakers."""
+
+    if (cache := hass.data.get(DATA_ARTWORK)) is None:
+        path = hass.config.path(".cache", DOMAIN, "artwork") if ARTWORK_DISK_BYTES else None
+        cache = hass.data[DATA_ARTWORK] = ArtworkCache(hass, path)
+        await cache.async_load()
+
+    return cache
+
+
+class ArtworkCache:
+    """Least recently used artwork by url, in memory and optionally on disk.
+
+    Each image is fetched once however many clients ask for it at the same time,
+    and revalidated with its ETag or Last-Modified date once it is older than
+    ARTWORK_REVALIDATE_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        path: str | None = None,
+        memory_bytes: int = ARTWORK_MEMORY_BYTES,
+        disk_bytes: int = ARTWORK_DISK_BYTES,
+    ):
+        """Initialize artwork cache."""
+        self._hass = hass
+        self._path = path
+        self._memory_bytes = memory_bytes
+        self._disk_bytes = disk_bytes
+        self._memory: OrderedDict[str, Artwork] = OrderedDict()
+        self._memory_size = 0
+        # Url and size of the images on disk by key, least recently used first.
+        self._disk: OrderedDict[str, tuple[str, int]] = OrderedDict()
+        self._disk_size = 0
+        self._digests: dict[str, str] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+
+
+    async def async_load(self) -> None:
+        """Load the index of the images stored on disk."""
+        if self._path is None:
+            return
+
+        for key, url, digest, size in await self._hass.async_add_executor_job(self._load_index):
+            self._disk[key] = (url, size)
+            self._disk_size += size
+            self._digests[url] = digest
+
+
+    def image_hash(self, url: str | None) -> str | None:
+        """Hash of the artwork at url, its content digest once it was fetched."""
+        if url is None:
+            return None
+        return self._digests.get(url) or url_key(url)
+
+
+    async def async_get(self, url: str) -> Artwork | None:
+        """Artwork at url, fetched or revalidated if needed, None if it cannot be fetched."""
+
+        artwork = self._memory.get(url)
+        if artwork is not None:
+            self._memory.move_to_end(url)
+        elif (key := url_key(url)) in self._disk:
+            self._disk.move_to_end(key)
+            artwork = await self._hass.async_add_executor_job(self._read, key)
+            if artwork is not None:
+                self._remember(url, artwork)
+
+        if artwork is not None and time.time() - artwork.validated_at < ARTWORK_REVALIDATE_INTERVAL:
+            return artwork
+
+        task = self._inflight.get(url)
+        if task is None:
+            task = self._inflight[url] = asyncio.ensure_future(self._async_fetch(url, artwork))
+            task.add_done_callback(partial(self._fetch_done, url))
+
+        return await asyncio.shield(task)
+
+
+    def _fetch_done(self, url: str, task: asyncio.Future) -> None:
+        if self._inflight.get(url) is task:
+            del self._inflight[url]
+
+
+    async def _async_fetch(self, url: str, cached: Artwork | None) -> Artwork | None:
+        """Fetch artwork from its origin, conditionally if a cached copy exists."""
+
+        headers = {}
+        if cached is not None and cached.etag is not None:
+            headers[hdrs.IF_NONE_MATCH] = cached.etag
+        if cached is not None and cached.last_modified is not None:
+            headers[hdrs.IF_MODIFIED_SINCE] = cached.last_modified
+
+        session = hass_aiohttp.async_get_clientsession(self._hass)
+        try:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=ARTWORK_TIMEOUT)) as response:
+                if response.status == 304 and cached is not None:
+                    artwork = cached._replace(validated_at=time.time())
+                elif response.status == 200:
+                    content = await response.read()
+                    artwork = Artwork(
+                        content=content,
+                        content_type=response.content_type,
+                        digest=hashlib.sha256(content).hexdigest()[:16],
+                        etag=response.headers.get(hdrs.ETAG),
+                        last_modified=response.headers.get(hdrs.LAST_MODIFIED),
+                        validated_at=time.time(),
+                    )
+                else:
+                    _LOGGER.debug("Could not fetch artwork %s: HTTP %s", url, response.status)
+                    return cached
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Stale artwork is better than none.
+            _LOGGER.debug("Could not fetch artwork %s: %s", url, e)
+            return cached
+
+        self._remember(url, artwork)
+        if self._path is not None:
+            await self._async_store(url, artwork, cached)
+
+        return artwork
+
+
+    def _remember(self, url: str, artwork: Artwork) -> None:
+        """Keep artwork in memory, dropping the least recently used beyond the budget."""
+
+        previous = self._memory.pop(url, None)
+        if previous is not None:
+            self._memory_size -= len(previous.content)
+
+        self._memory[url] = artwork
+        self._memory_size += len(artwork.content)
+        self._digests[url] = artwork.digest
+
+        while self._memory_size > self._memory_bytes and len(self._memory) > 1:
+            evicted_url, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted.content)
+            if url_key(evicted_url) not in self._disk:
+                self._digests.pop(evicted_url, None)
+
+
+    async def _async_store(self, url: str, artwork: Artwork, cached: Artwork | None) -> None:
+        """Write artwork to disk, dropping the least recently used beyond the budget."""
+
+        key = url_key(url)
+        # A revalidated image only needs its validators written again.
+        write_content = key not in self._disk or cached is None or artwork.content is not cached.content
+        _, previous_size = self._disk.pop(key, (url, 0))
+        self._disk[key] = (url, len(artwork.content))
+        self._disk_size += len(artwork.content) - previous_size
+
+        evicted = []
+        while self._disk_size > self._disk_bytes and len(self._disk) > 1:
+            evicted_key, (evicted_url, size) = self._disk.popitem(last=False)
+            self._disk_size -= size
+            evicted.append(evicted_key)
+            if evicted_url not in self._memory:
+                self._digests.pop(evicted_url, None)
+
+        try:
+            await self._hass.async_add_executor_job(self._write, key, url, artwork, write_content, evicted)
+        except OSError as e:
+            _LOGGER.warning("Could not store artwork in %s: %s", self._path, e)
+
+
+    # Executor jobs.
+
+    def _load_index(self) -> list[tuple[str, str, str, int]]:
+        if not os.path.isdir(self._path):
+            return []
+
+        entries = []
+        for name in os.listdir(self._path):
+            if not name.endswith(".json"):
+                continue
+            key = name[: -len(".json")]
+            try:
+                with open(os.path.join(self._path, name), encoding="utf-8") as file:
+                    meta = json.load(file)
+                stat = os.stat(os.path.join(self._path, key + ".img"))
+            except (OSError, ValueError):
+                continue
+            entries.append((stat.st_mtime, key, meta["url"], meta["digest"], stat.st_size))
+
+        return [ entry[1:] for entry in sorted(entries) ]
+
+
+    def _read(self, key: str) -> Artwork | None:
+        try:
+            with open(os.path.join(self._path, key + ".json"), encoding="utf-8") as file:
+                meta = json.load(file)
+            with open(os.path.join(self._path, key + ".img"), "rb") as file:
+                content = file.read()
+            # The modification time orders the images by last use across restarts.
+            os.utime(os.path.join(self._path, key + ".img"))
+        except (OSError, ValueError):
+            return None
+
+        return Artwork(content=content, **{ field: meta[field] for field in Artwork._fields[1:] })
+
+
+    def _write(self, key: str, url: str, artwork: Artwork, write_content: bool, evicted: list[str]) -> None:
+        os.makedirs(self._path, exist_ok=True)
+
+        meta: dict[str, Any] = artwork._asdict()
+        del meta["content"]
+        meta["url"] = url
+
+        if write_content:
+            with open(os.path.join(self._path, key + ".img"), "wb") as file:
+                file.write(artwork.content)
+        with open(os.path.join(self._path, key + ".json"), "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+
+        for evicted_key in evicted:
+            for suffix in (".img", ".json"):
+                try:
+                    os.remove(os.path.join(self._path, evicted_key + suffix))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,97 @@
+"""Media browsing of KEF speakers through the browse tree of the speaker."""
+
+from __future__ import annotations
+
+from homeassistant.components.media_player import BrowseError, BrowseMedia, MediaClass
+
+from .exceptions import CannotConnect
+from .kef_connector import PATH_BROWSE_ROOT, BrowsePage, KefConnector
+
+# Content type of the nodes of the browse tree, played by their path.
+MEDIA_TYPE_ROW = "kef_row"
+
+# Separates the path of a node from the first row of a page in a content id.
+PAGE_SEPARATOR = "#from="
+
+ROW_CLASSES = {
+    "container": MediaClass.DIRECTORY,
+    "audio": MediaClass.TRACK,
+    "video": MediaClass.VIDEO,
+}
+
+
+def page_id(path: str, start: int = 0) -> str:
+    """Content id of the page of a node starting at row start."""
+    return path if start == 0 else f"{path}{PAGE_SEPARATOR}{start}"
+
+
+def parse_page_id(content_id: str | None) -> tuple[str, int]:
+    """Path and first row of the page a content id refers to."""
+
+    if not content_id:
+        return PATH_BROWSE_ROOT, 0
+
+    path, separator, start = content_id.rpartition(PAGE_SEPARATOR)
+    if not separator or not start.isdigit():
+        return content_id, 0
+    return path, int(start)
+
+
+async def async_browse_media(speaker: KefConnector, content_id: str | None) -> BrowseMedia:
+    """Browse a page of a node of the speaker, the following rows behind a last child."""
+
+    path, start = parse_page_id(content_id)
+    try:
+        page = await speaker.get_rows(path, start)
+    except CannotConnect as e:
+        raise BrowseError(f"Cannot browse {path}: {e}") from e
+
+    children = [ _row_media(row) for row in page.rows if row.get("path") ]
+    if page.has_more:
+        children.append(_next_page_media(page))
+
+    return BrowseMedia(
+        media_class=MediaClass.DIRECTORY,
+        media_content_id=page_id(path, start),
+        media_content_type=MEDIA_TYPE_ROW,
+        title=_page_title(page),
+        can_play=False,
+        can_expand=True,
+        children=children,
+        children_media_class=MediaClass.DIRECTORY,
+    )
+
+
+def _row_media(row: dict) -> BrowseMedia:
+    """Child of a browsed node."""
+
+    row_type = row.get("type")
+    return BrowseMedia(
+        media_class=ROW_CLASSES.get(row_type, MediaClass.DIRECTORY),
+        media_content_id=row["path"],
+        media_content_type=MEDIA_TYPE_ROW,
+        title=row.get("title") or row["path"],
+        can_play=row_type in ("audio", "video") or bool(row.get("containerPlayable")),
+        can_expand=row_type == "container",
+        thumbnail=row.get("icon"),
+    )
+
+
+def _next_page_media(page: BrowsePage) -> BrowseMedia:
+    """Child opening the rows following a page."""
+    return BrowseMedia(
+        media_class=MediaClass.DIRECTORY,
+        media_content_id=page_id(page.path, page.end),
+        media_content_type=MEDIA_TYPE_ROW,
+        title=f"More ({page.end + 1}-{page.count})",
+        can_play=False,
+        can_expand=True,
+    )
+
+
+def _page_title(page: BrowsePage) -> str:
+    """Title of a browsed node, with the rows shown once it spans several pages."""
+    title = page.title or "KEF"
+    if page.start == 0 and not page.has_more:
+        return title
+    return f"{title} ({page.start + 1}-{page.end} of {page.count})"
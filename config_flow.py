@@ -2,59 +2,73 @@
 
 from __future__ import annotations
 
+import ipaddress
 import logging
 from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.config_entries import ConfigFlow
-from homeassistant.core import HomeAssistant
+from homeassistant.components import network
+from homeassistant.config_entries import SOURCE_INTEGRATION_DISCOVERY, ConfigFlow
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
-import homeassistant.helpers.aiohttp_client as hass_aiohttp
 
-from .const import CONF_HOST, DOMAIN
+from .const import CONF_DEVICE_NAME, CONF_HOST, CONF_MAC_ADDRESS, CONF_NETWORK, DOMAIN
 from .exceptions import CannotConnect
-from .kef_connector import KefConnector
+from .kef_connector import IDENTITY_PATHS, KefConnector, discover, hosts_in_network
 
 _LOGGER = logging.getLogger(__name__)
 
+# Network proposed for a sweep when the local network cannot be determined.
+DEFAULT_NETWORK = "192.168.1.0/24"
+
 
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
     """Validate the user input allows us to connect."""
 
     _LOGGER.debug("validate_input")
 
-    try:
-
-        host = data[CONF_HOST]
-        session = hass_aiohttp.async_get_clientsession(hass)
-
-        speaker = KefConnector(host, session, hass)
+    host = data[CONF_HOST]
+    speaker = KefConnector(host)
 
+    try:
         _LOGGER.info("Trying to connect to KEF LSX II at %s", host)
-        mac_address = await speaker.mac_address
-        device_name = await speaker.device_name
+        snapshot = await speaker.fetch_snapshot(IDENTITY_PATHS)
 
-        if mac_address is None:
+        if snapshot.mac_address is None:
             raise CannotConnect  # noqa: TRY301
 
     except Exception as e:  # noqa: BLE001
         _LOGGER.error(str(e))
         raise CannotConnect from None
 
+    finally:
+        await speaker.close_session()
+
     return {
-        "title": device_name,
-        CONF_HOST: data[CONF_HOST]
+        "title": snapshot.device_name,
+        CONF_HOST: data[CONF_HOST],
+        **snapshot.identity
     }
 
 
 class KefConfigFlow(ConfigFlow, domain = DOMAIN):
-    """Handle a config flow for Dyson Pure Cool."""
+    """Handle a config flow for KEF LSX II."""
 
     VERSION = 1
 
+    def __init__(self) -> None:
+        """Initialize config flow."""
+        self._discovered: dict[str, dict[str, Any]] = {}
+
+
     async def async_step_user(self, user_input: dict[str, Any] | None = None) -> FlowResult:
         """Handle a flow initialized by user."""
+        return self.async_show_menu(step_id="user", menu_options=["discovery", "manual"])
+
+
+    async def async_step_manual(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        """Handle a speaker entered by its host."""
 
         errors: dict[str, str] = {}
         if user_input is not None:
@@ -64,7 +78,7 @@ class KefConfigFlow(ConfigFlow, domain = DOMAIN):
                 await self.async_set_unique_id(user_input[CONF_HOST])
                 self._abort_if_unique_id_configured()
 
-                return self.async_create_entry(title=info["title"], data=user_input)
+                return self.async_create_entry(title=info.pop("title"), data=info)
 
             except CannotConnect:
                 errors["base"] = "cannot_connect"
@@ -75,12 +89,94 @@ class KefConfigFlow(ConfigFlow, domain = DOMAIN):
         }
 
         return self.async_show_form(
-            step_id="user",
+            step_id="manual",
+            data_schema=vol.Schema(data),
+            errors=errors,
+        )
+
+
+    async def async_step_discovery(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        """Sweep a network for speakers."""
+
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            try:
+                hosts = hosts_in_network(user_input[CONF_NETWORK])
+            except ValueError:
+                errors[CONF_NETWORK] = "invalid_network"
+            else:
+                speakers = await discover(hosts)
+                self._discovered = {
+                    speaker[CONF_MAC_ADDRESS]: speaker for speaker in speakers if not self._async_update_known_speaker(speaker)
+                }
+                if self._discovered:
+                    return await self.async_step_pick()
+
+                errors["base"] = "no_devices_found"
+
+        data = {
+            vol.Required(CONF_NETWORK, default=await self._async_default_network()): str
+        }
+
+        return self.async_show_form(
+            step_id="discovery",
             data_schema=vol.Schema(data),
             errors=errors,
         )
 
 
+    async def async_step_pick(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        """Pick one of the discovered speakers, the others are offered as discovered devices."""
+
+        if user_input is not None:
+            speaker = self._discovered.pop(user_input[CONF_MAC_ADDRESS])
+
+            for other in self._discovered.values():
+                self.hass.async_create_task(
+                    self.hass.config_entries.flow.async_init(
+                        DOMAIN, context={"source": SOURCE_INTEGRATION_DISCOVERY}, data=other
+                    )
+                )
+
+            return await self._async_create_speaker_entry(speaker)
+
+        speakers = {
+            mac_address: f"{speaker[CONF_DEVICE_NAME]} ({speaker[CONF_HOST]})" for mac_address, speaker in self._discovered.items()
+        }
+
+        return self.async_show_form(
+            step_id="pick",
+            data_schema=vol.Schema({vol.Required(CONF_MAC_ADDRESS): vol.In(speakers)}),
+        )
+
+
+    async def async_step_integration_discovery(self, discovery_info: dict[str, Any]) -> FlowResult:
+        """Handle a speaker found by a network sweep of another flow."""
+
+        if self._async_update_known_speaker(discovery_info):
+            return self.async_abort(reason="already_configured")
+
+        await self.async_set_unique_id(discovery_info[CONF_HOST])
+        self._abort_if_unique_id_configured()
+
+        self._discovered = {discovery_info[CONF_MAC_ADDRESS]: discovery_info}
+        self.context["title_placeholders"] = {"name": discovery_info[CONF_DEVICE_NAME]}
+        return await self.async_step_discovery_confirm()
+
+
+    async def async_step_discovery_confirm(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        """Confirm adding a discovered speaker."""
+
+        speaker = next(iter(self._discovered.values()))
+        if user_input is not None:
+            return await self._async_create_speaker_entry(speaker)
+
+        return self.async_show_form(
+            step_id="discovery_confirm",
+            description_placeholders={"name": speaker[CONF_DEVICE_NAME], "host": speaker[CONF_HOST]},
+        )
+
+
     async def async_step_import(self, user_input: dict) -> FlowResult:
         """Handle a flow initialized by import from configuration file."""
 
@@ -91,4 +187,42 @@ class KefConfigFlow(ConfigFlow, domain = DOMAIN):
             CONF_HOST: user_input[CONF_HOST]
         })
 
-        return self.async_create_entry(title=info["title"], data=user_input)
+        return self.async_create_entry(title=info.pop("title"), data=info)
+
+
+    async def _async_create_speaker_entry(self, speaker: dict[str, Any]) -> FlowResult:
+        """Create the entry of a discovered speaker."""
+
+        await self.async_set_unique_id(speaker[CONF_HOST])
+        self._abort_if_unique_id_configured()
+
+        return self.async_create_entry(title=speaker[CONF_DEVICE_NAME], data=speaker)
+
+
+    @callback
+    def _async_update_known_speaker(self, speaker: dict[str, Any]) -> bool:
+        """Return True if the speaker is configured, following it to a new host after a DHCP change."""
+
+        for entry in self._async_current_entries(include_ignore=False):
+            if entry.data.get(CONF_MAC_ADDRESS) != speaker[CONF_MAC_ADDRESS]:
+                continue
+
+            if entry.data[CONF_HOST] != speaker[CONF_HOST]:
+                _LOGGER.info("%s moved from %s to %s", speaker[CONF_DEVICE_NAME], entry.data[CONF_HOST], speaker[CONF_HOST])
+                self.hass.config_entries.async_update_entry(
+                    entry, unique_id=speaker[CONF_HOST], data={**entry.data, CONF_HOST: speaker[CONF_HOST]}
+                )
+                self.hass.async_create_task(self.hass.config_entries.async_reload(entry.entry_id))
+
+            return True
+
+        return False
+
+
+    async def _async_default_network(self) -> str:
+        """Network of the interface Home Assistant uses to reach the local network."""
+        try:
+            source_ip = await network.async_get_source_ip(self.hass)
+        except Exception:  # noqa: BLE001
+            return DEFAULT_NETWORK
+        return str(ipaddress.ip_network(f"{source_ip}/24", strict=False))
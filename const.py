@@ -4,3 +4,8 @@
 DOMAIN = "kef_speaker"
 
 CONF_HOST = "host"
+CONF_MAC_ADDRESS = "mac_address"
+CONF_DEVICE_NAME = "device_name"
+CONF_MODEL = "model"
+CONF_FIRMWARE_VERSION = "firmware_version"
+CONF_NETWORK = "network"
@@ -0,0 +1,130 @@
+"""Coordinator fetching the state of a KEF LSX II speaker for all its entities."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .const import CONF_DEVICE_NAME, DOMAIN
+from .exceptions import CannotConnect
+from .kef_connector import (
+    EVENT_PATHS,
+    KefConnector,
+    KefSnapshot,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Poll intervals depending on what the speaker is doing.
+PLAYING_INTERVAL = timedelta(seconds=10)
+IDLE_INTERVAL = timedelta(seconds=30)
+STANDBY_INTERVAL = timedelta(minutes=5)
+
+# Seconds the speaker holds a poll of the event queue open.
+EVENT_POLL_TIMEOUT = 10
+
+# Seconds to wait before subscribing again to the event queue.
+EVENT_RETRY_INTERVAL = 30
+
+
+class KefCoordinator(DataUpdateCoordinator[KefSnapshot]):
+    """Fetch the state of a speaker once for all of its entities."""
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, speaker: KefConnector):
+        """Initialize coordinator."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} {entry.data[CONF_DEVICE_NAME]}",
+            update_interval=IDLE_INTERVAL,
+        )
+        self.speaker = speaker
+        self.subscribed = False
+
+
+    async def _async_update_data(self) -> KefSnapshot:
+        """Fetch the paths relevant for the current state of the speaker."""
+
+        try:
+            snapshot = await self.speaker.fetch_update(self.data)
+        except CannotConnect as e:
+            raise UpdateFailed(f"Error communicating with speaker: {e}") from e
+
+        self._update_interval_for(snapshot)
+        return snapshot
+
+
+    @callback
+    def async_set_updated_data(self, data: KefSnapshot) -> None:
+        """Share a snapshot received outside of a refresh, like pushed events or confirmed commands."""
+
+        woke_up = self.data is not None and self.data.source == "standby" and data.source != "standby"
+
+        self._update_interval_for(data)
+        super().async_set_updated_data(data)
+
+        if woke_up and not self.subscribed:
+            # The media paths were not fetched during standby.
+            self.hass.async_create_task(self.async_request_refresh())
+
+
+    def _update_interval_for(self, snapshot: KefSnapshot) -> None:
+        """Adapt the poll interval to the state of the speaker."""
+
+        if self.subscribed:
+            # Changes are pushed by the event queue.
+            self.update_interval = None
+        elif snapshot.source == "standby":
+            self.update_interval = STANDBY_INTERVAL
+        elif snapshot.state == "playing":
+            self.update_interval = PLAYING_INTERVAL
+        else:
+            self.update_interval = IDLE_INTERVAL
+
+
+    def async_start_listening(self, entry: ConfigEntry) -> None:
+        """Start listening to the event queue of the speaker."""
+        entry.async_create_background_task(
+            self.hass, self._async_listen_events(), f"{DOMAIN} event queue {self.name}"
+        )
+
+
+    async def _async_listen_events(self) -> None:
+        """Apply changes pushed by the speaker, fall back to polling on failure."""
+
+        while True:
+            try:
+                await self.speaker.subscribe(EVENT_PATHS)
+                self.subscribed = True
+                # Events only carry changes, start from a complete state.
+                await self.async_refresh()
+
+                while True:
+                    events = await self.speaker.poll_events(EVENT_POLL_TIMEOUT)
+                    if self.data is None:
+                        continue
+
+                    # Reads the play time after a track change or for the drift check.
+                    synced_at = self.speaker.clock.synced_at
+                    snapshot = await self.speaker.sync_clock(self.data.merged(events))
+
+                    if events or self.speaker.clock.synced_at != synced_at:
+                        self.async_set_updated_data(snapshot)
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:  # noqa: BLE001
+                if self.subscribed:
+                    _LOGGER.warning("Event queue of %s unavailable, falling back to polling: %s", self.name, e)
+                self.subscribed = False
+                if self.data is not None:
+                    self._update_interval_for(self.data)
+                    await self.async_request_refresh()
+
+            await asyncio.sleep(EVENT_RETRY_INTERVAL)
@@ -0,0 +1,33 @@
+"""Diagnostics support for the KEF LSX II integration."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_MAC_ADDRESS, DOMAIN
+
+TO_REDACT = {CONF_MAC_ADDRESS}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics of a config entry, with the statistics of every path."""
+
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    speaker = coordinator.speaker
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": str(coordinator.update_interval),
+            "subscribed": coordinator.subscribed,
+        },
+        "available": speaker.available,
+        "requests": speaker.stats_summary(include_events=True),
+        "paths": { key: stats.as_dict() for key, stats in sorted(speaker.stats.items()) },
+        "snapshot": coordinator.data.values if coordinator.data is not None else None,
+    }
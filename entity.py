@@ -0,0 +1,40 @@
+"""Base entity for the KEF LSX II integration."""
+
+from __future__ import annotations
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import (
+    CONF_DEVICE_NAME,
+    CONF_FIRMWARE_VERSION,
+    CONF_HOST,
+    CONF_MAC_ADDRESS,
+    CONF_MODEL,
+    DOMAIN,
+)
+from .coordinator import KefCoordinator
+from .kef_connector import KefConnector
+
+
+class KefEntity(CoordinatorEntity[KefCoordinator]):
+    """Entity of a KEF speaker, updated by the coordinator of the speaker."""
+
+    def __init__(self, coordinator: KefCoordinator, config_entry: ConfigEntry):
+        """Initialize entity."""
+        super().__init__(coordinator)
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, config_entry.data[CONF_MAC_ADDRESS])},
+            name=config_entry.data[CONF_DEVICE_NAME],
+            manufacturer="KEF",
+            model=config_entry.data[CONF_MODEL],
+            configuration_url="http://" + config_entry.data[CONF_HOST],
+            sw_version=config_entry.data[CONF_FIRMWARE_VERSION],
+        )
+
+
+    @property
+    def _speaker(self) -> KefConnector:
+        """Connector of the speaker."""
+        return self.coordinator.speaker
@@ -1,7 +1,23 @@
 """Exceptions for the KEF LSX II integration."""
 
-from homeassistant.exceptions import HomeAssistantError
+try:
+    from homeassistant.exceptions import HomeAssistantError
+except ImportError:
+    # Used as a library without Home Assistant.
+    HomeAssistantError = Exception
 
 
 class CannotConnect(HomeAssistantError):
     """Error to indicate we cannot connect."""
+
+
+class SpeakerTimeout(CannotConnect):
+    """Error to indicate the speaker did not answer in time."""
+
+
+class SpeakerUnavailable(CannotConnect):
+    """Error to indicate the speaker failed repeatedly and is not contacted for now."""
+
+
+class InvalidResponse(CannotConnect):
+    """Error to indicate the speaker sent a response that cannot be parsed."""
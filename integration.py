@@ -0,0 +1,163 @@
+"""Home Assistant setup of the KEF LSX II integration."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import voluptuous as vol
+
+from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE, Platform
+from homeassistant.core import Event, HomeAssistant
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import config_validation as cv, device_registry as dr
+from homeassistant.helpers.typing import ConfigType
+
+from .const import CONF_FIRMWARE_VERSION, CONF_HOST, CONF_MAC_ADDRESS, DOMAIN
+from .coordinator import KefCoordinator
+from .exceptions import CannotConnect
+from .kef_connector import IDENTITY_PATHS, PATH_RELEASE_TEXT, KefConnector
+from .services import async_setup_services
+
+_LOGGER = logging.getLogger(__name__)
+
+
+PLATFORMS: list[Platform] = [Platform.MEDIA_PLAYER, Platform.SENSOR]
+
+# Speakers connected to at once after their entities were set up.
+STARTUP_CONCURRENCY = 8
+
+DATA_STARTUP = f"{DOMAIN}_startup"
+
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema({
+            vol.Optional(CONF_HOST, default=""): cv.string
+        })
+    },
+    extra = vol.ALLOW_EXTRA
+)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up KEF LSX II from configuration file."""
+
+    async_setup_services(hass)
+
+    if DOMAIN not in config:
+        return True
+
+    hass.async_create_task(
+        hass.config_entries.flow.async_init(
+            DOMAIN,
+            context={"source": SOURCE_IMPORT},
+            data=config[DOMAIN]
+        )
+    )
+
+    return True
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Set up KEF LSX II from a config entry."""
+
+    try:
+        host = entry.data[CONF_HOST]
+
+        # The connector owns its connection pool, it is closed with the entry or on shutdown.
+        speaker = KefConnector(host)
+        entry.async_on_unload(speaker.close_session)
+
+        async def _async_close_session(event: Event) -> None:
+            await speaker.close_session()
+
+        entry.async_on_unload(hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_session))
+
+        if entry.data.get(CONF_MAC_ADDRESS) is None:
+            # Entries created before the identity was stored in the config entry.
+            _LOGGER.info("Trying to connect to KEF LSX II at %s", host)
+            snapshot = await speaker.fetch_snapshot(IDENTITY_PATHS)
+
+            if snapshot.mac_address is None:
+                _LOGGER.error("Connection refused")
+                raise ConfigEntryNotReady from None
+
+            hass.config_entries.async_update_entry(entry, data={**entry.data, **snapshot.identity})
+
+        # One coordinator per speaker shares every fetch between its entities.
+        coordinator = KefCoordinator(hass, entry, speaker)
+
+        hass.data.setdefault(DOMAIN, {})
+        hass.data[DOMAIN][entry.entry_id] = coordinator
+        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+        # Startup does not wait for background tasks, the entities stay unavailable
+        # until the speaker answered.
+        entry.async_create_background_task(hass, _async_connect(hass, entry, coordinator), f"{DOMAIN} connect {host}")
+
+    except CannotConnect:
+        _LOGGER.error("Connection refused")
+        raise ConfigEntryNotReady from None
+
+    return True
+
+
+async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Unload a config entry."""
+
+    if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        hass.data[DOMAIN].pop(entry.entry_id)
+
+    return unload_ok
+
+
+async def _async_connect(hass: HomeAssistant, entry: ConfigEntry, coordinator: KefCoordinator) -> None:
+    """Fetch the first state of a speaker and listen to its changes.
+
+    At most STARTUP_CONCURRENCY speakers are connected to at once across all
+    entries, so a large fleet does not flood the network on startup. A speaker
+    that does not answer keeps being polled by its coordinator.
+    """
+
+    if (semaphore := hass.data.get(DATA_STARTUP)) is None:
+        semaphore = hass.data[DATA_STARTUP] = asyncio.Semaphore(STARTUP_CONCURRENCY)
+
+    async with semaphore:
+        await coordinator.async_refresh()
+
+    coordinator.async_start_listening(entry)
+
+    if coordinator.last_update_success:
+        await _async_check_firmware(hass, entry, coordinator.speaker)
+
+
+async def _async_check_firmware(hass: HomeAssistant, entry: ConfigEntry, speaker: KefConnector) -> None:
+    """Refresh the stored identity of the speaker after a firmware update."""
+
+    try:
+        snapshot = await speaker.fetch_snapshot([PATH_RELEASE_TEXT])
+        # A release text without a version says nothing about an update.
+        if snapshot.firmware_version in (None, entry.data.get(CONF_FIRMWARE_VERSION)):
+            return
+
+        snapshot = await speaker.fetch_snapshot(IDENTITY_PATHS)
+
+    except Exception as e:  # noqa: BLE001
+        _LOGGER.debug("Could not check firmware of %s: %s", entry.data[CONF_HOST], e)
+        return
+
+    if snapshot.mac_address is None:
+        return
+
+    _LOGGER.info("Firmware of %s changed to %s", snapshot.device_name, snapshot.firmware_version)
+    hass.config_entries.async_update_entry(entry, data={**entry.data, **snapshot.identity})
+
+    device_registry = dr.async_get(hass)
+    device = device_registry.async_get_device(identifiers={(DOMAIN, entry.data[CONF_MAC_ADDRESS])})
+    if device is not None:
+        device_registry.async_update_device(
+            device.id,
+            model=snapshot.model,
+            sw_version=snapshot.firmware_version
+        )
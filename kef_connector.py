@@ -1,40 +1,932 @@
 """Class to control KEF LS50 Wireless II, LSX II and LS60."""
 
-import homeassistant.helpers.aiohttp_client as hass_aiohttp
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+import ipaddress
+from itertools import count
+import json
+import math
+import random
+import time
+from typing import Any, NamedTuple
+
+import aiohttp
+
+from .exceptions import CannotConnect, InvalidResponse, SpeakerTimeout, SpeakerUnavailable
+
+# Parallel requests the small web server of the speaker handles reliably, and how
+# many of them are kept free for commands while background polls are running.
+MAX_CONCURRENT_REQUESTS = 4
+RESERVED_COMMAND_SLOTS = 1
+
+# Priority classes of the requests to a speaker, lowest first.
+PRIORITY_COMMAND = 0
+PRIORITY_CONFIRM = 1
+PRIORITY_POLL = 2
+
+# Seconds to wait for the speaker to confirm a command, and between two checks.
+CONFIRM_TIMEOUT = 3
+CONFIRM_INTERVAL = 0.25
+
+# Seconds to wait for a single request to the speaker.
+REQUEST_TIMEOUT = 5
+
+# Seconds to wait for a connection to the speaker, seconds an idle connection is kept
+# open for the next request and seconds a resolved host name is reused.
+CONNECT_TIMEOUT = 2
+KEEPALIVE_TIMEOUT = 15
+DNS_CACHE_TTL = 300
+
+# Additional attempts for requests that can safely be sent again.
+REQUEST_RETRIES = 2
+
+# Upper bounds in seconds of the first and of any backoff before a retry.
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 2
+
+# Consecutive failed requests after which the speaker is marked unavailable.
+FAILURE_THRESHOLD = 3
+
+# Seconds between probes of a speaker marked unavailable.
+RECOVERY_INTERVAL = 30
+
+# Seconds a host may take to answer the discovery probe, hosts probed at once and
+# largest network swept.
+DISCOVERY_TIMEOUT = 1.5
+DISCOVERY_CONCURRENCY = 256
+DISCOVERY_MAX_HOSTS = 1024
+
+# Seconds a read is served to identical reads that follow it, 0 disables the cache.
+READ_CACHE_TTL = 0.1
+
+# Latest requests per path kept to compute latency percentiles.
+STATS_WINDOW = 256
+
+# Seconds between reads of the play time while the position is interpolated, and
+# milliseconds of drift tolerated before the interpolation is corrected.
+DRIFT_CHECK_INTERVAL = 60
+DRIFT_TOLERANCE = 2000
+
+# Volume writes per second a fade sends at most.
+FADE_MAX_RATE = 4
+
+# Rows fetched per page when browsing, pages kept and seconds before a kept page
+# is fetched again.
+BROWSE_PAGE_SIZE = 100
+BROWSE_CACHE_PAGES = 64
+BROWSE_CACHE_TTL = 300
+
+# Input sources a speaker can be switched to, standby aside.
+SOURCES = ( "wifi", "bluetooth", "tv", "optical", "usb", "analog" )
+
+PATH_MAC_ADDRESS     = "settings:/system/primaryMacAddress"
+PATH_DEVICE_NAME     = "settings:/deviceName"
+PATH_RELEASE_TEXT    = "settings:/releasetext"
+PATH_PLAYER_DATA     = "player:player/data"
+PATH_PLAY_TIME       = "player:player/data/playTime"
+PATH_PLAY_MODE       = "settings:/mediaPlayer/playMode"
+PATH_SPEAKER_STATUS  = "settings:/kef/host/speakerStatus"
+PATH_PHYSICAL_SOURCE = "settings:/kef/play/physicalSource"
+PATH_VOLUME          = "player:volume"
+PATH_VOLUME_STEP     = "settings:/kef/host/volumeStep"
+PATH_VOLUME_LIMIT    = "settings:/kef/host/volumeLimit"
+PATH_MUTE            = "settings:/mediaPlayer/mute"
+PATH_MAXIMUM_VOLUME  = "settings:/kef/host/maximumVolume"
+PATH_PLAYER_CONTROL  = "player:player/control"
+
+# Root of the browse tree: presets, network services and USB or UPnP libraries.
+PATH_BROWSE_ROOT     = "ui:"
+
+# Paths describing the device itself, they only change with a firmware update.
+IDENTITY_PATHS = (
+    PATH_MAC_ADDRESS,
+    PATH_DEVICE_NAME,
+    PATH_RELEASE_TEXT,
+)
+
+# Paths needed to refresh the state of a media player entity.
+UPDATE_PATHS = (
+    PATH_PLAYER_DATA,
+    PATH_PLAY_TIME,
+    PATH_PHYSICAL_SOURCE,
+    PATH_VOLUME,
+    PATH_VOLUME_STEP,
+    PATH_MAXIMUM_VOLUME,
+    PATH_MUTE,
+)
+
+# Paths only meaningful while the speaker is playing something.
+MEDIA_PATHS = (
+    PATH_PLAYER_DATA,
+    PATH_PLAY_TIME,
+)
+
+# Paths needed to refresh the state of a speaker in standby.
+STANDBY_PATHS = tuple(path for path in UPDATE_PATHS if path not in MEDIA_PATHS)
+
+# Paths read on every refresh, the play time is interpolated by PlaybackClock
+# and only read when the interpolation cannot be trusted.
+STATE_PATHS = tuple(path for path in UPDATE_PATHS if path != PATH_PLAY_TIME)
+
+# Paths saved and restored by a scene: what is heard, not what is played. The power
+# status follows from the source, leaving it out keeps the batch within the
+# requests the speaker handles at once.
+SCENE_PATHS = (
+    PATH_PHYSICAL_SOURCE,
+    PATH_VOLUME,
+    PATH_MUTE,
+    PATH_PLAY_MODE,
+)
+
+# Paths registered on the event queue. The play time is left out as it changes
+# every second.
+EVENT_PATHS = STATE_PATHS
+
+# Paths whose value a write changes besides the written path itself.
+DEPENDENT_PATHS = {
+    PATH_PHYSICAL_SOURCE: (PATH_SPEAKER_STATUS, *MEDIA_PATHS),
+    PATH_SPEAKER_STATUS: (PATH_PHYSICAL_SOURCE, *MEDIA_PATHS),
+    PATH_MUTE: (PATH_VOLUME,),
+    PATH_PLAYER_CONTROL: MEDIA_PATHS,
+}
+
+
+class PlaybackClock:
+    """Model of the playback position of a speaker between reads of its play time.
+
+    The position is anchored to the last play time read from the speaker. It is
+    read again when the track or the play state changes, after a seek, and
+    periodically to correct drift.
+    """
+
+    def __init__(self, drift_check_interval: float = DRIFT_CHECK_INTERVAL, drift_tolerance: int = DRIFT_TOLERANCE):
+        """Initialize playback clock."""
+        self._drift_check_interval = drift_check_interval
+        self._drift_tolerance = drift_tolerance
+        self._track = None
+        self._playing = False
+        self._stale = True
+        self._checked_at = None
+
+        # Position in milliseconds at the wall clock time synced_at.
+        self.position = None
+        self.synced_at = None
+
+
+    @property
+    def sync_needed(self) -> bool:
+        """Boolean if the play time has to be read from the speaker."""
+        if self._stale:
+            return True
+        return self._playing and time.monotonic() - self._checked_at > self._drift_check_interval
+
+
+    def predict(self, when: float | None = None) -> int | None:
+        """Interpolated position in milliseconds at the given wall clock time."""
+        if self.position is None:
+            return None
+        if not self._playing:
+            return self.position
+        return self.position + int(((when or time.time()) - self.synced_at) * 1000)
+
+
+    def observe(self, values: dict[str, dict]) -> None:
+        """Update the model from values read from or pushed by the speaker."""
+
+        player = values.get(PATH_PLAYER_DATA)
+        if player is not None:
+            track = (player.get("trackRoles", {}).get("id"), player.get("trackRoles", {}).get("title"))
+            playing = player.get("state") == "playing"
+            if track != self._track or playing != self._playing:
+                self._track = track
+                self._playing = playing
+                self._stale = True
+
+        play_time = values.get(PATH_PLAY_TIME, {}).get("i64_")
+        if play_time is not None:
+            now = time.time()
+            predicted = self.predict(now)
+            # Keep the anchor while the interpolation is accurate, so nothing changes.
+            if self._stale or predicted is None or abs(predicted - play_time) > self._drift_tolerance:
+                self.position = play_time
+                self.synced_at = now
+            self._stale = False
+            self._checked_at = time.monotonic()
+
+
+    def seek(self, position: int) -> None:
+        """Anchor the position to a requested seek, to be confirmed by the speaker."""
+        self.position = position
+        self.synced_at = time.time()
+        self._stale = True
+
+
+class PlayerData(NamedTuple):
+    """Value of player:player/data, parsed once and shared by every consumer of a snapshot."""
+
+    state: str | None = None
+
+    # Id and title of the track, they identify a change of track.
+    track: tuple[str | None, str | None] = (None, None)
+    title: str | None = None
+    artist: str | None = None
+    album_name: str | None = None
+    image_url: str | None = None
+    duration: int | None = None
+    playlist: str | None = None
+    content_id: str | None = None
+    content_type: str | None = None
+    app_id: str | None = None
+
+    can_previous: bool = False
+    can_pause: bool = False
+    can_next: bool = False
+    can_seek_track: bool = False
+    can_seek_time: bool = False
+    can_seek_bytes: bool = False
+    can_like: bool = False
+    can_dislike: bool = False
+
+    repeat_all: bool = False
+    shuffle_repeat_all: bool = False
+    shuffle: bool = False
+    repeat_one: bool = False
+    shuffle_repeat_one: bool = False
+
+
+    @classmethod
+    def parse(cls, data: dict) -> PlayerData:
+        """Parse a value of player:player/data in a single pass."""
+
+        if not data:
+            return NO_PLAYER_DATA
+
+        track = data.get("trackRoles") or _EMPTY
+        media = data.get("mediaRoles") or _EMPTY
+        controls = data.get("controls") or _EMPTY
+        play_modes = controls.get("playMode") or _EMPTY
+        track_data = track.get("mediaData") or _EMPTY
+        media_data = media.get("mediaData") or _EMPTY
+        track_meta = track_data.get("metaData") or _EMPTY
+        media_meta = media_data.get("metaData") or _EMPTY
+
+        # The roles of the track take precedence, except for the content type where the
+        # mime type of the media resources is the most specific.
+        content_id = track.get("id")
+        if content_id is None:
+            content_id = media.get("id")
+
+        content_type = _mime_type(media_data)
+        if content_type is None:
+            content_type = _mime_type(track_data)
+        if content_type is None:
+            content_type = media.get("type")
+        if content_type is None:
+            content_type = track.get("type")
+
+        app_id = track_meta.get("serviceID")
+        if app_id is None:
+            app_id = media_meta.get("serviceID")
+
+        return cls(
+            state=data.get("state"),
+            track=(track.get("id"), track.get("title")),
+            title=track.get("title"),
+            artist=track_meta.get("artist"),
+            album_name=track_meta.get("album"),
+            image_url=track.get("icon"),
+            duration=(data.get("status") or _EMPTY).get("duration"),
+            playlist=media.get("title"),
+            content_id=content_id,
+            content_type=content_type,
+            app_id=app_id,
+            can_previous=controls.get("previous", False),
+            can_pause=controls.get("pause", False),
+            can_next=controls.get("next_", False),
+            can_seek_track=controls.get("seekTrack", False),
+            can_seek_time=controls.get("seekTime", False),
+            can_seek_bytes=controls.get("seekBytes", False),
+            can_like=controls.get("like", False),
+            can_dislike=controls.get("dislike", False),
+            repeat_all=play_modes.get("repeatAll", False),
+            shuffle_repeat_all=play_modes.get("shuffleRepeatAll", False),
+            shuffle=play_modes.get("shuffle", False),
+            repeat_one=play_modes.get("repeatOne", False),
+            shuffle_repeat_one=play_modes.get("shuffleRepeatOne", False),
+        )
+
+
+    @property
+    def repeat(self) -> bool:
+        """Boolean if a repeat mode is available."""
+        return self.repeat_all or self.repeat_one
+
+
+_EMPTY: dict = {}
+
+NO_PLAYER_DATA = PlayerData()
+
+
+def _mime_type(media_data: dict) -> str | None:
+    """Mime type of the first resource of media data."""
+    resources = media_data.get("resources")
+    return resources[0].get("mimeType") if resources else None
+
+
+
+class KefSnapshot:
+    """Values of several speaker paths, fetched together and parsed on demand."""
+
+    def __init__(self, values: dict[str, dict], player: PlayerData | None = None):
+        """Initialize snapshot from the values of the fetched paths."""
+        self._values = values
+        self._player = player
+        self._fingerprint = None
+
+
+    def value(self, path: str) -> dict:
+        """Raw value of a path, empty if the path was not fetched."""
+        return self._values.get(path, {})
+
+
+    @property
+    def paths(self) -> list[str]:
+        """Paths contained in the snapshot."""
+        return list(self._values)
+
+
+    @property
+    def values(self) -> dict[str, dict]:
+        """Raw values of all paths contained in the snapshot."""
+        return dict(self._values)
+
+
+    def merged(self, values: dict[str, dict]) -> KefSnapshot:
+        """Return a new snapshot with the given path values replaced."""
+        # The parsed player data carries over unless it was replaced.
+        return KefSnapshot({**self._values, **values}, None if PATH_PLAYER_DATA in values else self._player)
+
+
+    @property
+    def player(self) -> PlayerData:
+        """Parsed player data of the speaker."""
+        if self._player is None:
+            self._player = PlayerData.parse(self.value(PATH_PLAYER_DATA))
+        return self._player
+
+
+    @property
+    def fingerprint(self) -> int:
+        """Hash of the parsed state, equal for snapshots that show the same state.
+
+        The play time is left out, the position is anchored by the playback clock.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = hash((
+                self.player,
+                self.source,
+                self.status,
+                self.play_mode,
+                self.volume_level,
+                self.volume_step,
+                self.maximum_volume,
+                self.is_volume_limited,
+                self.is_volume_muted,
+            ))
+        return self._fingerprint
+
+
+    @property
+    def mac_address(self) -> str | None:
+        """Mac address of the Speaker."""
+        return self.value(PATH_MAC_ADDRESS).get("string_", None)
+
+
+    @property
+    def device_name(self) -> str | None:
+        """Friendly name of the Speaker."""
+        return self.value(PATH_DEVICE_NAME).get("string_", None)
+
+
+    @property
+    def model(self) -> str | None:
+        """Model of the speaker, the release text reads model_version."""
+        model, _, _ = self.value(PATH_RELEASE_TEXT).get("string_", "").partition("_")
+        return model or None
+
+
+    @property
+    def firmware_version(self) -> str | None:
+        """Firmware version of the speaker, None without a version in the release text."""
+        _, _, version = self.value(PATH_RELEASE_TEXT).get("string_", "").partition("_")
+        return version or None
+
+
+    @property
+    def identity(self) -> dict[str, str | None]:
+        """Static identity of the speaker, stored alongside its configuration."""
+        return {
+            "mac_address": self.mac_address,
+            "device_name": self.device_name,
+            "model": self.model,
+            "firmware_version": self.firmware_version
+        }
+
+
+    @property
+    def state(self) -> str | None:
+        """State of the speaker : 'playing', 'paused', 'stopped'."""
+        return self.player.state
+
+
+    @property
+    def controls(self) -> dict:
+        """Possible control functions of the speaker."""
+
+        player = self.player
+        return {
+            "previous": player.can_previous,
+            "pause": player.can_pause,
+            "next": player.can_next,
+            "seekTrack": player.can_seek_track,
+            "seekTime": player.can_seek_time,
+            "seekBytes": player.can_seek_bytes,
+            "like": player.can_like,
+            "dislike": player.can_dislike,
+            "playMode": {
+                "repeatAll": player.repeat_all,
+                "shuffleRepeatAll": player.shuffle_repeat_all,
+                "shuffle": player.shuffle,
+                "repeatOne": player.repeat_one,
+                "shuffleRepeatOne": player.shuffle_repeat_one,
+            },
+            "repeat": player.repeat,
+            "shuffle": player.shuffle,
+        }
+
+
+    @property
+    def play_mode(self) -> str | None:
+        """Play mode of the speaker."""
+        return self.value(PATH_PLAY_MODE).get("playerPlayMode", None)
+
+
+    @property
+    def status(self) -> str | None:
+        """Status of the speaker : 'standby' or 'powerOn'."""
+        return self.value(PATH_SPEAKER_STATUS).get("kefSpeakerStatus", None)
+
+
+    @property
+    def source(self) -> str | None:
+        """Input source of the speaker : 'standby', 'powerOn', 'wifi', 'bluetooth', 'tv', 'optical', 'usb', 'analog'."""
+        return self.value(PATH_PHYSICAL_SOURCE).get("kefPhysicalSource", None)
+
+
+    @property
+    def volume_level(self) -> int | None:
+        """Volume level of the speaker."""
+        return self.value(PATH_VOLUME).get("i32_", None)
+
+
+    @property
+    def volume_step(self) -> int | None:
+        """Step to be used by the volume_up and volume_down services."""
+        return self.value(PATH_VOLUME_STEP).get("i16_", None)
+
+
+    @property
+    def is_volume_limited(self) -> int | None:
+        """Boolean if volume is limited."""
+        return self.value(PATH_VOLUME_LIMIT).get("bool_", None)
+
+
+    @property
+    def is_volume_muted(self) -> bool | None:
+        """Boolean if volume is currently muted."""
+        return self.value(PATH_MUTE).get("bool_", None) == "True"
+
+
+    @property
+    def maximum_volume(self) -> int | None:
+        """Maximum volume of the speaker."""
+        return self.value(PATH_MAXIMUM_VOLUME).get("i32_", None)
+
+
+    def poll_speaker(self) -> dict:
+        """Media information of the speaker."""
+
+        player = self.player
+        return {
+            "media_position": self.value(PATH_PLAY_TIME).get("i64_", None),
+            "media_duration": player.duration,
+            "media_image_url": player.image_url,
+            "media_title": player.title,
+            "media_artist": player.artist,
+            "media_album_name": player.album_name,
+            "media_playlist": player.playlist,
+            "media_content_id": player.content_id,
+            "media_content_type": player.content_type,
+            "app_id": player.app_id,
+            "app_name": player.app_id,
+            # Not provided by the speaker.
+            "media_album_artist": None,
+            "media_track": None,
+            "media_series_title": None,
+            "media_season": None,
+            "media_episode": None,
+            "media_channel": None,
+        }
+
+
+
+class BrowsePage(NamedTuple):
+    """Window of the rows of a node of the browse tree."""
+
+    path: str
+    title: str | None
+    # Rows of the whole node, of which rows holds those from start on.
+    count: int
+    start: int
+    rows: list[dict]
+    fetched_at: float
+
+
+    @property
+    def end(self) -> int:
+        """Index following the last row of the page."""
+        return self.start + len(self.rows)
+
+
+    @property
+    def has_more(self) -> bool:
+        """Boolean if the node has rows after this page."""
+        return self.end < self.count
+
+
+
+class SpeakerScene(NamedTuple):
+    """Source, volume, mute, play mode and power status of a speaker, to be restored later."""
+
+    source: str | None
+    status: str | None
+    volume: int | None
+    muted: bool | None
+    play_mode: str | None
+
+
+    @classmethod
+    def from_snapshot(cls, snapshot: KefSnapshot) -> SpeakerScene:
+        """Scene of the values of a snapshot."""
+        status = snapshot.status
+        if status is None and snapshot.source is not None:
+            status = "standby" if snapshot.source == "standby" else "powerOn"
+
+        return cls(
+            source=snapshot.source,
+            status=status,
+            volume=snapshot.volume_level,
+            muted=snapshot.is_volume_muted,
+            play_mode=snapshot.play_mode,
+        )
+
+
+
+class RequestStats:
+    """Rolling statistics of the requests sent for one path."""
+
+    __slots__ = ("count", "errors", "timeouts", "bytes_received", "latencies")
+
+    def __init__(self):
+        """Initialize request statistics."""
+        self.count = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes_received = 0
+        self.latencies = deque(maxlen=STATS_WINDOW)
+
+
+    def record(self, latency: float, received: int) -> None:
+        """Record a successful request."""
+        self.count += 1
+        self.bytes_received += received
+        self.latencies.append(latency)
+
+
+    def record_error(self, latency: float, timeout: bool) -> None:
+        """Record a failed request."""
+        self.count += 1
+        self.errors += 1
+        self.timeouts += timeout
+        self.latencies.append(latency)
+
+
+    def as_dict(self) -> dict[str, Any]:
+        """Summary of the statistics."""
+        latencies = sorted(self.latencies)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "bytes_received": self.bytes_received,
+            "latency_p50_ms": _percentile(latencies, 50),
+            "latency_p95_ms": _percentile(latencies, 95),
+            "latency_p99_ms": _percentile(latencies, 99),
+        }
+
+
+def _percentile(latencies: list[float], percent: float) -> float | None:
+    """Percentile in milliseconds of sorted latencies in seconds."""
+    if not latencies:
+        return None
+    return round(latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))] * 1000, 1)
+
+
+class CircuitBreaker:
+    """Track failures of a speaker and stop contacting it when it fails repeatedly."""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, recovery_interval: float = RECOVERY_INTERVAL):
+        """Initialize circuit breaker."""
+        self._failure_threshold = failure_threshold
+        self._recovery_interval = recovery_interval
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+
+    @property
+    def is_open(self) -> bool:
+        """Boolean if the speaker is currently considered unavailable."""
+        return self._opened_at is not None
+
+
+    def try_probe(self) -> bool:
+        """Return True if the caller may send the single probe of an open breaker."""
+        if self._probing or time.monotonic() - self._opened_at < self._recovery_interval:
+            return False
+
+        self._probing = True
+        return True
+
+
+    def end_probe(self) -> None:
+        """Allow the next probe, whatever became of the current one."""
+        self._probing = False
+
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful request."""
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+
+    def record_failure(self) -> None:
+        """Count a failed request, opening the breaker past the threshold."""
+        self._failures += 1
+        self._probing = False
+        if self.is_open or self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+class FanOutResult(NamedTuple):
+    """Outcome of a command sent to several speakers at once."""
+
+    # Seconds from the dispatch until each speaker answered, and the errors of those
+    # that failed, by host.
+    elapsed: dict[str, float]
+    errors: dict[str, Exception]
+
+
+    @property
+    def duration(self) -> float:
+        """Seconds until the last speaker answered."""
+        return max(self.elapsed.values(), default=0)
+
+
+    @property
+    def spread(self) -> float:
+        """Seconds between the first and the last speaker answering."""
+        return self.duration - min(self.elapsed.values(), default=0)
+
+
+
+class RequestTicket:
+    """Place of a request in the queue of a RequestScheduler."""
+
+    __slots__ = ("priority", "order", "future", "sent", "superseded")
+
+    def __init__(self, priority: int):
+        """Initialize ticket."""
+        self.priority = priority
+        self.order = None
+        self.future = None
+        self.sent = False
+        # Set for a queued read made obsolete by a write, it is read again instead.
+        self.superseded = False
+
+
+
+class RequestScheduler:
+    """Slots for the requests sent to a speaker at once, granted by priority.
+
+    Commands go before confirmations, which go before background polls. Polls
+    leave the reserved slots free, so a command never waits for a slow refresh.
+    """
+
+    def __init__(self, slots: int = MAX_CONCURRENT_REQUESTS, reserved: int = RESERVED_COMMAND_SLOTS):
+        """Initialize scheduler."""
+        self._free = slots
+        self._reserved = min(reserved, slots - 1)
+        self._queue: list[RequestTicket] = []
+        self._order = count()
+
+
+    @contextmanager
+    def _queued(self, ticket: RequestTicket) -> Iterator[None]:
+        ticket.order = next(self._order)
+        self._queue.append(ticket)
+        try:
+            yield
+        finally:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+
+
+    async def acquire(self, ticket: RequestTicket) -> None:
+        """Wait for a slot, release it with release once the request is answered."""
+
+        if self._grantable(ticket) and not any(queued.priority <= ticket.priority for queued in self._queue):
+            self._free -= 1
+            ticket.sent = True
+            return
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        with self._queued(ticket):
+            try:
+                await ticket.future
+            except asyncio.CancelledError:
+                if ticket.future.done() and not ticket.future.cancelled():
+                    # Granted and cancelled at the same time, hand the slot on.
+                    self.release()
+                raise
+
+        ticket.sent = True
+
+
+    def release(self) -> None:
+        """Free a slot and grant it to the most urgent queued request."""
+        self._free += 1
+        self._dispatch()
+
+
+    def promote(self, ticket: RequestTicket, priority: int) -> None:
+        """Raise the priority of a request, when a more urgent caller shares it."""
+        if priority < ticket.priority:
+            ticket.priority = priority
+            self._dispatch()
+
+
+    def _grantable(self, ticket: RequestTicket) -> bool:
+        return self._free > (self._reserved if ticket.priority >= PRIORITY_POLL else 0)
+
+
+    def _dispatch(self) -> None:
+        while self._queue:
+            ticket = min(self._queue, key=lambda queued: (queued.priority, queued.order))
+            if not self._grantable(ticket):
+                return
+            self._queue.remove(ticket)
+            if not ticket.future.done():
+                self._free -= 1
+                ticket.future.set_result(None)
+
+
+
+# Priority of the requests sent by the current task, see prioritized.
+_priority: ContextVar[int] = ContextVar("kef_request_priority", default=PRIORITY_POLL)
+
+
+@contextmanager
+def prioritized(priority: int) -> Iterator[None]:
+    """Send the requests of the enclosed block with the given priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
 
 
 class KefConnector:
     """Connector class to control KEF LS50 Wireless II, LSX II and LS60."""
 
-    def __init__(self, host, session=None, hass=None):
+    def __init__(self, host, session=None, max_concurrent_requests=MAX_CONCURRENT_REQUESTS, timeout=REQUEST_TIMEOUT, retries=REQUEST_RETRIES, cache_ttl=READ_CACHE_TTL):
         """Initialize connector class."""
         self._host = host
+        self._scheduler = RequestScheduler(max_concurrent_requests)
+        # One more connection than requests at once keeps the long poll of the event
+        # queue from waiting for a free one.
+        self._max_connections = max_concurrent_requests + 1
+        self._timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=CONNECT_TIMEOUT)
+        self._retries = retries
+        self._cache_ttl = cache_ttl
+        self._cache: dict[str, tuple[float, list[dict]]] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._tickets: dict[str, RequestTicket] = {}
+        self._pages: OrderedDict[tuple[str, int, int], BrowsePage] = OrderedDict()
+        self._breaker = CircuitBreaker()
         self._session = session
-        self._hass = hass
+        self._owns_session = session is None
         self._previous_source = "wifi"
+        # Last source read from or pushed by the speaker.
+        self._source = None
+        self._answered_at = None
         self._getDataUrl = "http://" + self._host + "/api/getData"
         self._setDataUrl = "http://" + self._host + "/api/setData"
+        self._getRowsUrl = "http://" + self._host + "/api/getRows"
+        self._modifyQueueUrl = "http://" + self._host + "/api/event/modifyQueue"
+        self._pollQueueUrl = "http://" + self._host + "/api/event/pollQueue"
+        self._queue_id = None
+        self._volume_target = None
+        self._volume_task = None
+        self._fade_task = None
+        self.clock = PlaybackClock()
+        self.stats: dict[str, RequestStats] = {}
 
 
     async def close_session(self) -> None:
-        """Close session."""
-        if self._session is not None:
+        """Close the connection pool of the connector, a session passed in is left open."""
+        # Reads and writes still running would open a new pool for their next request.
+        for task in (*self._inflight.values(), self._volume_task, self._fade_task):
+            if task is not None:
+                task.cancel()
+        self._inflight.clear()
+        self._tickets.clear()
+        self._volume_task = None
+        self._fade_task = None
+
+        if self._session is not None and self._owns_session:
             await self._session.close()
-            self._session = None
+        self._session = None
+        self._queue_id = None
 
 
     async def resurect_session(self) -> None:
-        """Resurect session."""
-        if self._session is None:
-            self._session = hass_aiohttp.async_get_clientsession(self._hass)
+        """Open a connection pool to the speaker unless the connector has a usable session.
 
+        A session passed in is never replaced, requests fail once it was closed.
+        """
+        if self._session is not None and not self._owns_session:
+            if self._session.closed:
+                raise CannotConnect(f"Session to {self._host} was closed")
+            return
+
+        if self._session is None or self._session.closed:
+            self._session = create_session(self._max_connections)
+            self._owns_session = True
+
+
+    @property
+    def host(self) -> str:
+        """Host of the speaker, with its port if one was given."""
+        return self._host
+
+
+    @property
+    def available(self) -> bool:
+        """Boolean if the speaker answered recently."""
+        return not self._breaker.is_open
+
+
+    def stats_summary(self, include_events: bool = False) -> dict[str, Any]:
+        """Request statistics over all paths, the long polls of the event queue excluded."""
+
+        summary = RequestStats()
+        # Every latency kept per path counts, not only the window of the last paths.
+        summary.latencies = []
+        for key, stats in self.stats.items():
+            if key.startswith("event/pollQueue") and not include_events:
+                continue
+            summary.count += stats.count
+            summary.errors += stats.errors
+            summary.timeouts += stats.timeouts
+            summary.bytes_received += stats.bytes_received
+            summary.latencies.extend(stats.latencies)
+
+        return summary.as_dict()
 
 
     @property
     async def mac_address(self) -> str | None:
         """Get the mac address of the Speaker."""
-        response = await self._get("settings:/system/primaryMacAddress")
-        return response[0].get("string_", None)
+        return (await self.fetch_snapshot([PATH_MAC_ADDRESS])).mac_address
 
 
     @property
@@ -46,114 +938,90 @@ class KefConnector:
     @property
     async def device_name(self) -> str | None:
         """Get the friendly name of the Speaker."""
-        response = await self._get("settings:/deviceName")
-        return response[0].get("string_", None)
+        return (await self.fetch_snapshot([PATH_DEVICE_NAME])).device_name
 
 
     @property
     async def model(self) -> str | None:
         """Get the model of the speaker."""
-        response = await self._get("settings:/releasetext")
-        return response[0].get("string_", "?_?").split("_")[0]
+        return (await self.fetch_snapshot([PATH_RELEASE_TEXT])).model
 
 
     @property
-    async def firmware_version(self) -> str:
+    async def firmware_version(self) -> str | None:
         """Get the firmware version of the speaker."""
-        response = await self._get("settings:/releasetext")
-        return response[0].get("string_", "?_?").split("_")[1]
+        return (await self.fetch_snapshot([PATH_RELEASE_TEXT])).firmware_version
 
 
     @property
     async def state(self) -> str | None:
         """State of the speaker : 'playing', 'paused', 'stopped'."""
-        response = await self._get("player:player/data")
-        return response[0].get("state", None)
+        return (await self.fetch_snapshot([PATH_PLAYER_DATA])).state
 
 
     @property
     async def controls(self) -> dict:
         """Possible control functions of the speaker."""
-
-        response = await self._get("player:player/data")
-
-        controls = {}
-        controls["previous"]  = response[0].get("controls", {}).get("previous", False)
-        controls["pause"]     = response[0].get("controls", {}).get("pause", False)
-        controls["next"]      = response[0].get("controls", {}).get("next_", False)
-        controls["seekTrack"] = response[0].get("controls", {}).get("seekTrack", False)
-        controls["seekTime"]  = response[0].get("controls", {}).get("seekTime", False)
-        controls["seekBytes"] = response[0].get("controls", {}).get("seekBytes", False)
-        controls["like"]      = response[0].get("controls", {}).get("like", False)
-        controls["dislike"]   = response[0].get("controls", {}).get("dislike", False)
-
-        controls["playMode"]                     = {}
-        controls["playMode"]["repeatAll"]        = response[0].get("controls", {}).get("playMode", {}).get("repeatAll", False)
-        controls["playMode"]["shuffleRepeatAll"] = response[0].get("controls", {}).get("playMode", {}).get("shuffleRepeatAll", False)
-        controls["playMode"]["shuffle"]          = response[0].get("controls", {}).get("playMode", {}).get("shuffle", False)
-        controls["playMode"]["repeatOne"]        = response[0].get("controls", {}).get("playMode", {}).get("repeatOne", False)
-        controls["playMode"]["shuffleRepeatOne"] = response[0].get("controls", {}).get("playMode", {}).get("shuffleRepeatOne", False)
-
-        controls["repeat"]  = controls["playMode"]["repeatAll"] or controls["playMode"]["repeatOne"]
-        controls["shuffle"] = controls["playMode"]["shuffle"]
-
-        return controls
+        return (await self.fetch_snapshot([PATH_PLAYER_DATA])).controls
 
 
     @property
     async def play_mode(self) -> str | None:
         """Play mode of the speaker."""
-        response = await self._get("settings:/mediaPlayer/playMode")
-        return response[0].get("playerPlayMode", None)
+        return (await self.fetch_snapshot([PATH_PLAY_MODE])).play_mode
 
 
     @property
     async def status(self) -> str | None:
         """Status of the speaker : 'standby' or 'powerOn'."""
-        response = await self._get("settings:/kef/host/speakerStatus")
-        return response[0].get("kefSpeakerStatus", None)
+        return (await self.fetch_snapshot([PATH_SPEAKER_STATUS])).status
 
 
     @property
     async def source(self) -> str | None:
         """Input source of the speaker : 'standby', 'powerOn', 'wifi', 'bluetooth', 'tv', 'optical', 'usb', 'analog'."""
-        response = await self._get("settings:/kef/play/physicalSource")
-        return response[0].get("kefPhysicalSource", None)
+        return (await self.fetch_snapshot([PATH_PHYSICAL_SOURCE])).source
 
 
     @property
     async def volume_level(self) -> int | None:
         """Volume level of the speaker."""
-        response = await self._get("player:volume")
-        return response[0].get("i32_", None)
+        return (await self.fetch_snapshot([PATH_VOLUME])).volume_level
 
 
     @property
     async def volume_step(self) -> int | None:
         """Return the step to be used by the volume_up and volume_down services."""
-        response = await self._get("settings:/kef/host/volumeStep")
-        return response[0].get("i16_", None)
+        return (await self.fetch_snapshot([PATH_VOLUME_STEP])).volume_step
 
 
     @property
     async def is_volume_limited(self) -> int | None:
         """Boolean if volume is limited."""
-        response = await self._get("settings:/kef/host/volumeLimit")
-        return response[0].get("bool_", None)
+        return (await self.fetch_snapshot([PATH_VOLUME_LIMIT])).is_volume_limited
 
 
     @property
     async def is_volume_muted(self) -> bool | None:
         """Boolean if volume is currently muted."""
-        response = await self._get("settings:/mediaPlayer/mute")
-        return response[0].get("bool_", None) == "True"
+        return (await self.fetch_snapshot([PATH_MUTE])).is_volume_muted
 
 
     @property
     async def maximum_volume(self) -> bool | None:
         """Maximum volume of the speaker."""
-        response = await self._get("settings:/kef/host/maximumVolume")
-        return response[0].get("i32_", None)
+        return (await self.fetch_snapshot([PATH_MAXIMUM_VOLUME])).maximum_volume
+
+
+    async def fetch_snapshot(self, paths: Iterable[str] = UPDATE_PATHS) -> KefSnapshot:
+        """Fetch each distinct path once, concurrently, and return the values as a snapshot."""
+        paths = list(dict.fromkeys(paths))
+        responses = await asyncio.gather(*(self._get(path) for path in paths))
+
+        values = { path: response[0] if response else {} for path, response in zip(paths, responses) }
+        self._observe(values)
+
+        return KefSnapshot(values)
 
 
     async def set_status(self, status: str) -> None:
@@ -168,23 +1036,136 @@ class KefConnector:
 
     async def turn_on(self) -> None:
         """Turn the speaker on."""
-        if self._previous_source not in [ "wifi", "bluetooth", "tv", "optical", "usb", "analog" ]:
+        if self._previous_source not in SOURCES:
             self._previous_source = "wifi"
 
         await self.set_source(self._previous_source)
 
 
     async def turn_off(self) -> None:
-        """Turn the speaker off."""
-        self._previous_source = await self.source
+        """Turn the speaker off, the source is only read if none was seen yet."""
+        if self._source is None:
+            with prioritized(PRIORITY_COMMAND):
+                self._source = await self.source
+        self._previous_source = self._source
         await self.set_source("standby")
 
 
+    async def warm_up(self) -> None:
+        """Open a connection to the speaker unless one was used within the keep-alive time.
+
+        Sent before commands that have to take effect on several speakers at the
+        same time, so none of them waits for a connection to be opened.
+        """
+        if self._answered_at is not None and time.monotonic() - self._answered_at < KEEPALIVE_TIMEOUT / 2:
+            return
+        await self._get(PATH_SPEAKER_STATUS)
+
+
     async def set_volume(self, volume: int) -> None:
-        """Set volume level of the speaker."""
+        """Set volume level of the speaker, ending a running fade."""
+        self.cancel_fade()
+        await self._set_volume(volume)
+
+
+    async def _set_volume(self, volume: int) -> None:
         await self._set("player:volume", "i32_", volume)
 
 
+    @property
+    def pending_volume(self) -> int | None:
+        """Volume requested with request_volume and not yet written, None if none is pending."""
+        return self._volume_target
+
+
+    async def request_volume(self, volume: int) -> None:
+        """Set volume level, merging bursts of requests into at most one write in flight.
+
+        While a write is in flight only the latest requested volume is kept, it is
+        written once the speaker answered.
+        """
+        # A volume set by hand takes over from a running fade.
+        self.cancel_fade()
+
+        self._volume_target = volume
+        if self._volume_task is None or self._volume_task.done():
+            self._volume_task = asyncio.create_task(self._write_volume())
+
+        # A cancelled caller must not cancel the writes requested by others.
+        await asyncio.shield(self._volume_task)
+
+
+    async def _write_volume(self) -> None:
+        """Write the latest requested volume until no newer one is pending."""
+        try:
+            written = None
+            while self._volume_target != written:
+                written = self._volume_target
+                await self.set_volume(written)
+        finally:
+            self._volume_target = None
+
+
+    async def fade_to(self, target: int, duration: float, max_rate: float = FADE_MAX_RATE) -> None:
+        """Ramp the volume linearly to target within duration seconds.
+
+        Each write sends the volume due at the time it is sent, on a monotonic
+        clock, at most max_rate times per second. A write that takes longer than a
+        step skips the steps it overlapped instead of queueing them, so the ramp
+        ends on time. The volume never exceeds the maximum volume of the speaker.
+        A new fade, a volume set with set_volume, request_volume or restore, or
+        cancel_fade ends it, and so does cancelling the caller.
+        """
+
+        self.cancel_fade()
+        self._fade_task = asyncio.create_task(self._fade(target, duration, max_rate))
+        await self._fade_task
+
+
+    def cancel_fade(self) -> None:
+        """Stop a running fade at the volume it reached."""
+        if self._fade_task is not None:
+            self._fade_task.cancel()
+            self._fade_task = None
+
+
+    async def _fade(self, target: int, duration: float, max_rate: float) -> None:
+
+        start = time.monotonic()
+        with prioritized(PRIORITY_COMMAND):
+            snapshot = await self.fetch_snapshot([PATH_VOLUME, PATH_MAXIMUM_VOLUME])
+
+        maximum = snapshot.maximum_volume if snapshot.maximum_volume is not None else 100
+        target = max(0, min(target, maximum))
+        level = origin = snapshot.volume_level if snapshot.volume_level is not None else target
+        interval = 1 / max_rate
+        # Writes are sent ahead by the time the last one took to be applied.
+        lead = 0
+
+        while True:
+            elapsed = time.monotonic() - start + lead
+            progress = 1 if elapsed >= duration else elapsed / duration
+            due = min(maximum, round(origin + (target - origin) * progress))
+
+            if due != level:
+                try:
+                    sent = time.monotonic()
+                    await self._set_volume(due)
+                    lead = min(duration, time.monotonic() - sent)
+                    level = due
+                except CannotConnect:
+                    if progress == 1:
+                        raise
+                    # The next step writes a newer volume anyway.
+
+            if progress == 1:
+                return
+
+            # Next step on the grid of the fade, the steps a slow write overlapped are skipped.
+            elapsed = time.monotonic() - start + lead
+            await asyncio.sleep(min(duration, (math.floor(elapsed / interval) + 1) * interval) - elapsed)
+
+
     async def mute(self) -> None:
         """Mute the volume of the speaker."""
         await self._set("settings:/mediaPlayer/mute", "bool_", "True")
@@ -223,6 +1204,7 @@ class KefConnector:
     async def seek(self, position: int) -> None:
         """Send seek command."""
         await self._control("seekTime", "time", position)
+        self.clock.seek(position)
 
 
     async def set_play_mode(self, play_mode: str) -> None:
@@ -235,118 +1217,519 @@ class KefConnector:
         await self._control("play", "media", uri)
 
 
-    async def _get(self, path: str) -> list[dict]:
+    async def play_row(self, path: str) -> None:
+        """Play an item of the browse tree, as the app does with its roles."""
+
+        roles = await self._request("get", self._getDataUrl, params={"path": path, "roles": "@all"}, priority=PRIORITY_COMMAND)
+        if isinstance(roles, list):
+            roles = roles[0] if roles else None
+        if not isinstance(roles, dict):
+            raise InvalidResponse(f"Unexpected response for {path}: {roles}")
+
         payload = {
-            "path": path,
-            "roles": "value"
+            "path": PATH_PLAYER_CONTROL,
+            "roles": "activate",
+            "value": json.dumps({"control": "play", "mediaRoles": roles}),
         }
 
-        await self.resurect_session()
-        async with self._session.get(self._getDataUrl, params=payload) as response:
-            return await response.json()
+        try:
+            await self._request("get", self._setDataUrl, params=payload, retry=False, priority=PRIORITY_COMMAND)
+        finally:
+            self._invalidate([PATH_PLAYER_CONTROL])
 
 
+    async def get_rows(self, path: str = PATH_BROWSE_ROOT, start: int = 0, count: int = BROWSE_PAGE_SIZE) -> BrowsePage:
+        """Rows start to start + count of a node of the browse tree.
+
+        Only the requested window is fetched, so large libraries open at the cost of
+        a single page. The latest BROWSE_CACHE_PAGES pages are kept for
+        BROWSE_CACHE_TTL seconds, going back up the tree does not fetch them again.
+        """
+
+        key = (path, start, count)
+        page = self._pages.get(key)
+        if page is not None and time.monotonic() - page.fetched_at < BROWSE_CACHE_TTL:
+            self._pages.move_to_end(key)
+            return page
 
-    async def _set(self, path: str, type: str, value: str) -> None:
         payload = {
             "path": path,
-            "roles": "value",
-            "value": f"""{{"type":"{type}","{type}":"{value}"}}"""
+            "roles": "@all",
+            "from": start,
+            "to": start + count,
         }
 
-        await self.resurect_session()
-        async with self._session.get(self._setDataUrl, params=payload) as response:
-            await response.json()
+        # Browsing is done by a user waiting for the result.
+        response = await self._request("get", self._getRowsUrl, params=payload, priority=PRIORITY_COMMAND)
+        if not isinstance(response, dict) or not isinstance(response.get("rows", []), list):
+            raise InvalidResponse(f"Unexpected rows for {path}: {response}")
 
+        rows = response.get("rows", [])[:count]
+        page = BrowsePage(
+            path=path,
+            title=(response.get("roles") or _EMPTY).get("title"),
+            count=response.get("rowsCount", start + len(rows)),
+            start=start,
+            rows=rows,
+            fetched_at=time.monotonic(),
+        )
 
-    async def _control(self, command: str, type: str|None = None, value: str|None = None) -> None:
+        self._pages[key] = page
+        self._pages.move_to_end(key)
+        while len(self._pages) > BROWSE_CACHE_PAGES:
+            self._pages.popitem(last=False)
+
+        return page
+
+
+    async def snapshot(self) -> SpeakerScene:
+        """Read the scene of the speaker in a single concurrent batch."""
+        with prioritized(PRIORITY_COMMAND):
+            return SpeakerScene.from_snapshot(await self.fetch_snapshot(SCENE_PATHS))
+
+
+    async def restore(self, scene: SpeakerScene) -> list[str]:
+        """Put a scene back, writing only the fields that differ from the live state.
+
+        The live state is read in one batch and the differing fields are written in
+        another. The source sets the power status with it, the status is only
+        written on its own when no source was saved. Returns the fields written.
+        A running fade is ended first, it would overwrite the restored volume.
+        """
+
+        self.cancel_fade()
+        live = await self.snapshot()
+        writes = {}
+
+        if scene.source is not None and scene.source != live.source:
+            writes["source"] = self.set_source(scene.source)
+        elif scene.source is None and scene.status is not None and scene.status != live.status:
+            writes["status"] = self.set_status(scene.status)
+
+        if scene.volume is not None and scene.volume != live.volume:
+            writes["volume"] = self.set_volume(scene.volume)
+        if scene.muted is not None and scene.muted != live.muted:
+            writes["muted"] = self.mute() if scene.muted else self.unmute()
+        if scene.play_mode is not None and scene.play_mode != live.play_mode:
+            writes["play_mode"] = self.set_play_mode(scene.play_mode)
+
+        await asyncio.gather(*writes.values())
+        return list(writes)
+
+
+    async def fetch_update(self, previous: KefSnapshot | None = None) -> KefSnapshot:
+        """Fetch the paths relevant for the last known state of the speaker.
+
+        In standby the media paths are skipped until the speaker wakes up, the values
+        not fetched are carried over from the previous snapshot.
+        """
+
+        in_standby = previous is not None and previous.source == "standby"
+        paths = STANDBY_PATHS if in_standby else STATE_PATHS
+        if not in_standby and self.clock.sync_needed:
+            paths += (PATH_PLAY_TIME,)
+
+        snapshot = await self.fetch_snapshot(paths)
+
+        if in_standby and snapshot.source != "standby":
+            # Woke up since the last refresh, the media paths are needed right away.
+            snapshot = snapshot.merged((await self.fetch_snapshot(MEDIA_PATHS)).values)
+
+        snapshot = await self.sync_clock(snapshot)
+
+        if previous is not None:
+            snapshot = previous.merged(snapshot.values)
+
+        return snapshot
+
+
+    async def sync_clock(self, snapshot: KefSnapshot) -> KefSnapshot:
+        """Read the play time if the snapshot revealed a change of track or play state."""
+        if snapshot.source == "standby" or not self.clock.sync_needed:
+            return snapshot
+        return snapshot.merged((await self.fetch_snapshot([PATH_PLAY_TIME])).values)
+
+
+    async def wait_for(
+        self,
+        paths: Iterable[str],
+        predicate: Callable[[KefSnapshot], bool],
+        timeout: float = CONFIRM_TIMEOUT,
+        interval: float = CONFIRM_INTERVAL,
+    ) -> KefSnapshot | None:
+        """Poll only the given paths until predicate holds, None if it did not in time."""
+
+        paths = list(paths)
+        deadline = time.monotonic() + timeout
+        while True:
+            with prioritized(PRIORITY_CONFIRM):
+                snapshot = await self.fetch_snapshot(paths)
+            if predicate(snapshot):
+                return snapshot
+            if time.monotonic() + interval > deadline:
+                return None
+            await asyncio.sleep(interval)
+
+
+    async def subscribe(self, paths: Iterable[str] = EVENT_PATHS) -> str:
+        """Register paths on the event queue of the speaker."""
 
         payload = {
-            "path": "player:player/control",
-            "roles": "activate"
+            "subscribe": [ {"path": path, "type": "itemWithValue"} for path in dict.fromkeys(paths) ],
+            "unsubscribe": []
         }
 
-        if type is None and value is None:
-            payload["value"] = f"""{{"control":"{command}"}}"""
-        else:
-            payload["value"] = f"""{{"control":"{command}", "{type}": "{value}" }}"""
+        queue_id = await self._request("post", self._modifyQueueUrl, json=payload, retry=False)
 
-        await self.resurect_session()
-        async with self._session.get(self._setDataUrl, params=payload) as response:
-            await response.json()
+        if isinstance(queue_id, list):
+            queue_id = queue_id[0]
 
+        self._queue_id = queue_id
+        return queue_id
 
 
-    async def poll_speaker(self) -> dict:
-        """Poll speaker for information."""
+    async def poll_events(self, timeout: int = 10) -> dict[str, dict]:
+        """Wait until subscribed paths change and return their new values."""
 
-        poll_speaker = {}
-        response = await self._get("player:player/data/playTime")
+        if self._queue_id is None:
+            raise CannotConnect("Not subscribed to the event queue")
 
-        # Position of current playing media.
-        poll_speaker["media_position"] = response[0].get("i64_", None)
+        payload = {
+            "queueId": self._queue_id,
+            "timeout": timeout
+        }
+
+        # The long poll bypasses the request cap and the circuit breaker, a failure
+        # only ends the subscription.
+        events = await self._send("get", self._pollQueueUrl, params=payload, timeout=aiohttp.ClientTimeout(total=timeout + REQUEST_TIMEOUT, sock_connect=CONNECT_TIMEOUT))
+
+        if not isinstance(events, list):
+            # The speaker answers with an error object once the queue expired.
+            self._queue_id = None
+            raise CannotConnect(f"Event queue expired: {events}")
+
+        values = { event["path"]: event.get("itemValue", {}) for event in events if "path" in event }
+        self._invalidate(values)
+        self._observe(values)
 
+        return values
 
-        response = await self._get("player:player/data")
 
-        # Duration of current playing media.
-        poll_speaker["media_duration"] = response[0].get("status", {}).get("duration", None)
+    def _observe(self, values: dict[str, dict]) -> None:
+        """Update the models kept of the speaker from values read or pushed."""
+        self.clock.observe(values)
+        source = values.get(PATH_PHYSICAL_SOURCE, _EMPTY).get("kefPhysicalSource")
+        if source is not None:
+            self._source = source
 
-        # Image url of current playing media.
-        poll_speaker["media_image_url"] = response[0].get("trackRoles", {}).get("icon", None)
 
-        # Title of current playing media.
-        poll_speaker["media_title"] = response[0].get("trackRoles", {}).get("title", None)
+    async def _get(self, path: str) -> list[dict]:
+        """Read a path, sharing one request between identical reads in flight or just answered."""
+
+        priority = _priority.get()
+        while True:
+            cached = self._cache.get(path)
+            if cached is not None and time.monotonic() - cached[0] < self._cache_ttl:
+                return cached[1]
+
+            task = self._inflight.get(path)
+            ticket = self._tickets.get(path)
+            if task is None:
+                ticket = self._tickets[path] = RequestTicket(priority)
+                task = self._inflight[path] = asyncio.ensure_future(self._read(path, ticket))
+                task.add_done_callback(partial(self._read_done, path))
+            elif ticket is not None:
+                self._scheduler.promote(ticket, priority)
+
+            try:
+                # A caller cancelled while waiting must not cancel the read of the others.
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                # A read superseded by a write before it was sent is read again.
+                if not (task.cancelled() and ticket is not None and ticket.superseded) or asyncio.current_task().cancelling():
+                    raise
+
+
+    async def _read(self, path: str, ticket: RequestTicket | None = None) -> list[dict]:
+        payload = {
+            "path": path,
+            "roles": "value"
+        }
 
-        # Artist of current playing media, music track only.
-        poll_speaker["media_artist"] = response[0].get("trackRoles", {}).get("mediaData", {}).get("metaData", {}).get("artist", None)
+        response = await self._request("get", self._getDataUrl, params=payload, ticket=ticket)
+        if not isinstance(response, list) or (response and not isinstance(response[0], dict)):
+            raise InvalidResponse(f"Unexpected response for {path}: {response}")
 
-        # Album name of current playing media, music track only.
-        poll_speaker["media_album_name"] = response[0].get("trackRoles", {}).get("mediaData", {}).get("metaData", {}) .get("album", None)
+        return response
 
 
-        # Title of Playlist currently playing.
-        poll_speaker["media_playlist"] = response[0].get("mediaRoles", {}).get("title", None)
+    def _read_done(self, path: str, task: asyncio.Future) -> None:
+        """Cache the result of a shared read unless a write invalidated it meanwhile."""
 
-        # Content ID of current playing media.
-        poll_speaker["media_content_id"] = response[0].get("trackRoles", {}).get("id", None)
-        if poll_speaker["media_content_id"] is None:
-            poll_speaker["media_content_id"] = response[0].get("mediaRoles", {}).get("id", None)
+        current = self._inflight.get(path) is task
+        if current:
+            del self._inflight[path]
+            self._tickets.pop(path, None)
+
+        # Retrieving the exception keeps reads whose callers all left from being reported.
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        if current and self._cache_ttl > 0:
+            self._cache[path] = (time.monotonic(), task.result())
+
+
+    def _invalidate(self, paths: Iterable[str]) -> None:
+        """Drop cached and in-flight reads of paths whose value changed.
+
+        Reads still queued are cancelled, their callers read the path again.
+        """
+
+        for path in paths:
+            for stale in (path, *DEPENDENT_PATHS.get(path, ())):
+                self._cache.pop(stale, None)
+                task = self._inflight.pop(stale, None)
+                ticket = self._tickets.pop(stale, None)
+                if task is not None and ticket is not None and not ticket.sent:
+                    ticket.superseded = True
+                    task.cancel()
+                # A read already sent keeps running for its callers, later reads start a new one.
+
+
+    async def _set(self, path: str, type: str, value: str) -> None:
+        payload = {
+            "path": path,
+            "roles": "value",
+            "value": f"""{{"type":"{type}","{type}":"{value}"}}"""
+        }
 
-        # Content type of current playing media.
-        poll_speaker["media_content_type"] = response[0].get("mediaRoles", {}).get("mediaData", {}).get("resources", [{}])[0].get("mimeType", None)
-        if poll_speaker["media_content_type"] is None:
-            poll_speaker["media_content_type"] = response[0].get("trackRoles", {}).get("mediaData", {}).get("resources", [{}])[0].get("mimeType", None)
-        if poll_speaker["media_content_type"] is None:
-            poll_speaker["media_content_type"] = response[0].get("mediaRoles", {}).get("type", None)
-        if poll_speaker["media_content_type"] is None:
-            poll_speaker["media_content_type"] = response[0].get("trackRoles", {}).get("type", None)
+        try:
+            await self._request("get", self._setDataUrl, params=payload, priority=PRIORITY_COMMAND)
+        finally:
+            self._invalidate([path])
 
-        # ID of the current running app.
-        poll_speaker["app_id"] = response[0].get("trackRoles", {}).get("mediaData", {}).get("metaData", {}) .get("serviceID", None)
-        if poll_speaker["app_id"] is None:
-            poll_speaker["app_id"] = response[0].get("mediaRoles", {}).get("mediaData", {}).get("metaData", {}) .get("serviceID", None)
 
-        # Name of the current running app.
-        poll_speaker["app_name"] = poll_speaker["app_id"]
+    async def _control(self, command: str, type: str|None = None, value: str|None = None) -> None:
 
+        payload = {
+            "path": PATH_PLAYER_CONTROL,
+            "roles": "activate"
+        }
 
-        # Album artist of current playing media, music track only.
-        poll_speaker["media_album_artist"] = None
+        if type is None and value is None:
+            payload["value"] = f"""{{"control":"{command}"}}"""
+        else:
+            payload["value"] = f"""{{"control":"{command}", "{type}": "{value}" }}"""
 
-        # Track number of current playing media, music track only.
-        poll_speaker["media_track"] = None
+        # Controls like play/pause toggle, sending them twice is not safe.
+        try:
+            await self._request("get", self._setDataUrl, params=payload, retry=False, priority=PRIORITY_COMMAND)
+        finally:
+            self._invalidate([payload["path"]])
+
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        params: dict | None = None,
+        json: Any = None,
+        retry: bool = True,
+        priority: int | None = None,
+        ticket: RequestTicket | None = None,
+    ) -> Any:
+        """Send a request within the request cap, retrying timeouts and connection errors.
+
+        Requests wait for a slot of the scheduler by priority, the priority of the
+        current task unless one is given.
+        """
+
+        if ticket is None:
+            ticket = RequestTicket(_priority.get() if priority is None else priority)
+
+        if self._breaker.is_open:
+            if not self._breaker.try_probe():
+                raise SpeakerUnavailable(f"Speaker at {self._host} is unavailable")
+            await self._probe()
+
+        attempts = 1 + (self._retries if retry else 0)
+        for attempt in range(attempts):
+            try:
+                await self._scheduler.acquire(ticket)
+                try:
+                    response = await self._send(method, url, params=params, json=json)
+                finally:
+                    self._scheduler.release()
+
+            except InvalidResponse:
+                # The speaker answered, sending the same request again will not help.
+                self._breaker.record_success()
+                raise
+
+            except CannotConnect:
+                if attempt + 1 == attempts:
+                    self._breaker.record_failure()
+                    raise
+                await asyncio.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+            else:
+                self._breaker.record_success()
+                return response
+
+
+    async def _probe(self) -> None:
+        """Send a single cheap request to a speaker marked unavailable."""
 
-        # Title of series of current playing media, TV show only.
-        poll_speaker["media_series_title"] = None
+        payload = {
+            "path": PATH_SPEAKER_STATUS,
+            "roles": "value"
+        }
 
-        # Season of current playing media, TV show only.
-        poll_speaker["media_season"] = None
+        try:
+            await self._send("get", self._getDataUrl, params=payload)
+        except InvalidResponse:
+            # The speaker answered, only the body was unexpected.
+            pass
+        except CannotConnect:
+            self._breaker.record_failure()
+            raise SpeakerUnavailable(f"Speaker at {self._host} is unavailable") from None
+        finally:
+            # A cancelled probe must not keep the next one from being sent.
+            self._breaker.end_probe()
+
+        self._breaker.record_success()
+
+
+    async def _send(self, method: str, url: str, params: dict | None = None, json: Any = None, timeout: aiohttp.ClientTimeout | None = None) -> Any:
+        """Send a single request and classify its errors."""
+
+        key = url.rsplit("/api/", 1)[-1]
+        if params is not None and params.get("roles") == "@all":
+            # Browsing reaches any node of the browse tree, one entry per path would grow forever.
+            key += " @all"
+        elif params is not None and "path" in params:
+            key += " " + params["path"]
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = RequestStats()
 
-        # Episode of current playing media, TV show only.
-        poll_speaker["media_episode"] = None
+        await self.resurect_session()
+        start = time.perf_counter()
+        try:
+            async with self._session.request(method, url, params=params, json=json, timeout=timeout or self._timeout) as response:
+                body = await response.read()
+                result = await response.json(content_type=None)
+
+        except asyncio.TimeoutError as e:
+            stats.record_error(time.perf_counter() - start, True)
+            raise SpeakerTimeout(f"Timeout while contacting {self._host}") from e
+        except ValueError as e:
+            stats.record_error(time.perf_counter() - start, False)
+            raise InvalidResponse(f"Invalid response from {self._host}: {e}") from e
+        except aiohttp.ClientError as e:
+            stats.record_error(time.perf_counter() - start, False)
+            raise CannotConnect(f"Error while contacting {self._host}: {e}") from e
+
+        stats.record(time.perf_counter() - start, len(body))
+        self._answered_at = time.monotonic()
+        return result
 
-        # Channel currently playing.
-        poll_speaker["media_channel"] = None
 
-        return poll_speaker
+    async def poll_speaker(self) -> dict:
+        """Poll speaker for information."""
+        return (await self.fetch_snapshot([PATH_PLAY_TIME, PATH_PLAYER_DATA])).poll_speaker()
+
+
+def create_session(limit: int, keepalive: bool = True) -> aiohttp.ClientSession:
+    """Client session with its own pool of at most limit connections per speaker.
+
+    Hosts given as IP addresses are connected to directly, host names are resolved
+    once per DNS_CACHE_TTL.
+    """
+
+    connector = aiohttp.TCPConnector(
+        limit=0 if keepalive else limit,
+        limit_per_host=limit if keepalive else 1,
+        force_close=not keepalive,
+        keepalive_timeout=KEEPALIVE_TIMEOUT if keepalive else None,
+        ttl_dns_cache=DNS_CACHE_TTL,
+    )
+
+    return aiohttp.ClientSession(connector=connector)
+
+
+def hosts_in_network(network: str, port: int | None = None) -> list[str]:
+    """Hosts of a network in CIDR notation, with an optional port, to be probed by discover."""
+
+    hosts = list(ipaddress.ip_network(network, strict=False).hosts())
+    if len(hosts) > DISCOVERY_MAX_HOSTS:
+        raise ValueError(f"Network {network} has more than {DISCOVERY_MAX_HOSTS} hosts")
+
+    return [ str(host) if port is None else f"{host}:{port}" for host in hosts ]
+
+
+async def discover(
+    hosts: Iterable[str],
+    session: aiohttp.ClientSession | None = None,
+    timeout: float = DISCOVERY_TIMEOUT,
+    concurrency: int = DISCOVERY_CONCURRENCY,
+) -> list[dict[str, str | None]]:
+    """Probe hosts concurrently for KEF speakers and return the host and identity of each one found.
+
+    Every host gets a single settings:/system/primaryMacAddress request with a strict
+    timeout, only the speakers answering it are asked for the rest of their identity.
+    Without a session the sweep opens its own, closed again once it is done.
+    """
+
+    if session is None:
+        async with create_session(concurrency, keepalive=False) as session:
+            return await discover(hosts, session, timeout, concurrency)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe(host: str) -> dict[str, str | None] | None:
+        speaker = KefConnector(host, session, timeout=timeout, retries=0)
+        try:
+            async with semaphore:
+                snapshot = await speaker.fetch_snapshot([PATH_MAC_ADDRESS])
+            if snapshot.mac_address is None:
+                return None
+            snapshot = snapshot.merged((await speaker.fetch_snapshot([PATH_DEVICE_NAME, PATH_RELEASE_TEXT])).values)
+            return {"host": host, **snapshot.identity}
+        except Exception:  # noqa: BLE001
+            # Any host of the network may answer, whatever it answers must not end the sweep.
+            return None
+
+    results = await asyncio.gather(*(probe(host) for host in dict.fromkeys(hosts)))
+    return [ result for result in results if result is not None ]
+
+
+async def fan_out(
+    speakers: Iterable[KefConnector],
+    command: Callable[[KefConnector], Awaitable[Any]],
+    warm_up: bool = True,
+) -> FanOutResult:
+    """Send a command to several speakers at once and measure when each one answered.
+
+    Each speaker goes ahead on its own: its connection is warmed up unless it was
+    used recently, then the command is sent, so speakers kept warm by their
+    coordinator answer within a single round trip. A speaker failing, or not
+    answering the warm-up, does not hold back the others, its error is part of
+    the result.
+    """
+
+    elapsed: dict[str, float] = {}
+    errors: dict[str, Exception] = {}
+    start = time.perf_counter()
+
+    async def send(speaker: KefConnector) -> None:
+        try:
+            if warm_up:
+                await speaker.warm_up()
+            await command(speaker)
+        except CannotConnect as e:
+            errors[speaker.host] = e
+        elapsed[speaker.host] = time.perf_counter() - start
+
+    await asyncio.gather(*(send(speaker) for speaker in dict.fromkeys(speakers)))
+    return FanOutResult(elapsed, errors)
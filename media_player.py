@@ -2,52 +2,133 @@
 
 from __future__ import annotations
 
-import asyncio
+from collections.abc import Callable, Coroutine, Iterable
+from datetime import timedelta
 import logging
+from typing import Any
+
+import voluptuous as vol
 
 from homeassistant.components.media_player import (
+    BrowseMedia,
     MediaPlayerDeviceClass,
     MediaPlayerEntity,
+    MediaType,
 )
 from homeassistant.components.media_player.const import (
     MediaPlayerEntityFeature,
     MediaPlayerState,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv, entity_platform
 from homeassistant.helpers.device_registry import format_mac
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 import homeassistant.util.dt as dt_util
 
-from .const import DOMAIN
-from .kef_connector import KefConnector
+from .artwork import ArtworkCache, async_get_artwork_cache
+from .browse_media import MEDIA_TYPE_ROW, async_browse_media
+from .const import CONF_DEVICE_NAME, CONF_MAC_ADDRESS, DOMAIN
+from .coordinator import KefCoordinator
+from .entity import KefEntity
+from .exceptions import CannotConnect
+from .kef_connector import (
+    CONFIRM_TIMEOUT,
+    MEDIA_PATHS,
+    PATH_MUTE,
+    PATH_PHYSICAL_SOURCE,
+    SOURCES,
+    KefSnapshot,
+    SpeakerScene,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+# Seconds a speaker may take to leave standby.
+WAKE_UP_TIMEOUT = 10
+
+SERVICE_SNAPSHOT_SCENE = "snapshot_scene"
+SERVICE_RESTORE_SCENE = "restore_scene"
+SERVICE_FADE_VOLUME = "fade_volume"
+
+ATTR_VOLUME_LEVEL = "volume_level"
+ATTR_DURATION = "duration"
+
 
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities: AddEntitiesCallback,) -> None:
     """Set up KEF LSX II media player from a config entry."""
 
-    speaker = hass.data[DOMAIN][config_entry.entry_id]
-    async_add_entities( [KefMediaPlayerEntity(hass, speaker)], update_before_add=True )
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+    artwork = await async_get_artwork_cache(hass)
+    async_add_entities( [KefMediaPlayerEntity(coordinator, config_entry, artwork)] )
+
+    platform = entity_platform.async_get_current_platform()
+    platform.async_register_entity_service(SERVICE_SNAPSHOT_SCENE, {}, "async_snapshot_scene")
+    platform.async_register_entity_service(SERVICE_RESTORE_SCENE, {}, "async_restore_scene")
+    platform.async_register_entity_service(
+        SERVICE_FADE_VOLUME,
+        {
+            vol.Required(ATTR_VOLUME_LEVEL): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+            vol.Required(ATTR_DURATION): vol.All(cv.time_period, cv.positive_timedelta),
+        },
+        "async_fade_volume",
+    )
 
 
-class KefMediaPlayerEntity(MediaPlayerEntity):
+class KefMediaPlayerEntity(KefEntity, MediaPlayerEntity):
     """Representation of a KEF LSX II media player entity."""
 
-    def __init__(self, hass: HomeAssistant, speaker: KefConnector):
+    def __init__(self, coordinator: KefCoordinator, config_entry: ConfigEntry, artwork: ArtworkCache):
         """Initialize media player entity."""
-        super().__init__()
-        self._speaker = speaker
-        self._name = None
+        super().__init__(coordinator, config_entry)
+        self._artwork = artwork
+        self._name = config_entry.data[CONF_DEVICE_NAME]
+        self._attr_unique_id = "KEF_" + format_mac(config_entry.data[CONF_MAC_ADDRESS])
         self._attr_icon = "mdi:speaker-wireless"
         self._attr_device_class = MediaPlayerDeviceClass.SPEAKER
+        self._position_synced_at = None
+        self._confirming = 0
+        # What the state last written was derived from, None after an optimistic change.
+        self._written = None
+        self._scene: SpeakerScene | None = None
+
+
+    async def async_added_to_hass(self) -> None:
+        """Apply the state fetched by the coordinator before the entity was added."""
+        await super().async_added_to_hass()
+        if self.coordinator.data is not None:
+            self._apply_snapshot(self.coordinator.data)
+
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Apply a new snapshot of the speaker."""
+        if self._confirming:
+            # Keep the optimistic state until the command is confirmed or rolled back.
+            return
+
+        snapshot = self.coordinator.data
+        written = (
+            snapshot.fingerprint if snapshot is not None else None,
+            self._speaker.pending_volume,
+            self._speaker.clock.synced_at,
+            self.available,
+        )
+        if written == self._written:
+            # Nothing shown changed, skip the state write.
+            return
+
+        self._written = written
+        if snapshot is not None:
+            self._apply_snapshot(snapshot)
+        self.async_write_ha_state()
 
 
     @property
-    def should_poll(self):
-        """Push an update after each command."""
-        return True
+    def available(self) -> bool:
+        """Unavailable until the first state of the speaker was fetched."""
+        return super().available and self.coordinator.data is not None
 
 
     @property
@@ -59,28 +140,13 @@ class KefMediaPlayerEntity(MediaPlayerEntity):
     @property
     def source_list(self) -> list[str] | None:
         """List of available input sources."""
-        return [ "wifi", "bluetooth", "tv", "optical", "usb", "analog" ]
+        return list(SOURCES)
 
 
-    async def async_update(self):
-        """Fetch new state data for this entity."""
+    def _apply_snapshot(self, snapshot: KefSnapshot) -> None:
+        """Update the entity attributes from a snapshot of the speaker."""
 
-        if self.name is None:
-            self._name = await self._speaker.device_name
-        if self.unique_id is None:
-            self._attr_unique_id = "KEF_" + format_mac(await self._speaker.mac_address)
-
-            self._attr_device_info = {
-                "identifiers": {(DOMAIN, await self._speaker.mac_address)},
-                "name": await self._speaker.device_name,
-                "manufacturer": "KEF",
-                "model": await self._speaker.model,
-                "configuration_url": "http://" + await self._speaker.ip_address,
-                "sw_version": await self._speaker.firmware_version
-            }
-
-
-        controls = await self._speaker.controls
+        player = snapshot.player
 
         self._attr_supported_features = (
             MediaPlayerEntityFeature.VOLUME_SET
@@ -89,29 +155,35 @@ class KefMediaPlayerEntity(MediaPlayerEntity):
             | MediaPlayerEntityFeature.TURN_ON
             | MediaPlayerEntityFeature.TURN_OFF
             | MediaPlayerEntityFeature.SELECT_SOURCE
+            | MediaPlayerEntityFeature.BROWSE_MEDIA
+            | MediaPlayerEntityFeature.PLAY_MEDIA
         )
 
-        if controls["pause"]:
+        if player.can_pause:
             self._attr_supported_features |= MediaPlayerEntityFeature.PLAY
             self._attr_supported_features |= MediaPlayerEntityFeature.PAUSE
-        if controls["next"]:
+        if player.can_next:
             self._attr_supported_features |= MediaPlayerEntityFeature.NEXT_TRACK
-        if controls["previous"]:
+        if player.can_previous:
             self._attr_supported_features |= MediaPlayerEntityFeature.PREVIOUS_TRACK
 
 
-        self._attr_volume_level = await self._speaker.volume_level / 100
-        self._attr_volume_step = await self._speaker.volume_step / 100
-        self._attr_volume_max = await self._speaker.maximum_volume / 100
-        self._attr_is_volume_muted = await self._speaker.is_volume_muted
+        # Keep showing a volume that is still being written to the speaker.
+        if self._speaker.pending_volume is not None:
+            self._attr_volume_level = self._speaker.pending_volume / 100
+        else:
+            self._attr_volume_level = snapshot.volume_level / 100
+        self._attr_volume_step = snapshot.volume_step / 100
+        self._attr_volume_max = snapshot.maximum_volume / 100
+        self._attr_is_volume_muted = snapshot.is_volume_muted
 
-        self._attr_source = await self._speaker.source
+        self._attr_source = snapshot.source
 
         match self._attr_source:
             case "standby":
                 self._attr_state = MediaPlayerState.OFF
             case "wifi" | "bluetooth":
-                match await self._speaker.state:
+                match player.state:
                     case "playing":
                         self._attr_state = MediaPlayerState.PLAYING
                     case "paused":
@@ -123,122 +195,269 @@ class KefMediaPlayerEntity(MediaPlayerEntity):
                 self._attr_state = MediaPlayerState.ON
 
 
-        poll_speaker = await self._speaker.poll_speaker()
-
-        self._attr_app_id = poll_speaker["app_id"]
-        self._attr_app_name = poll_speaker["app_name"]
-        self._attr_media_content_id = poll_speaker["media_content_id"]
-        self._attr_media_content_type = poll_speaker["media_content_type"]
-
-        self._attr_media_image_url = poll_speaker["media_image_url"]
-        self._attr_media_title = poll_speaker["media_title"]
-        self._attr_media_artist = poll_speaker["media_artist"]
-        self._attr_media_album_name = poll_speaker["media_album_name"]
-        self._attr_media_album_artist = poll_speaker["media_album_artist"]
-        self._attr_media_playlist = poll_speaker["media_playlist"]
-        self._attr_media_channel = poll_speaker["media_channel"]
-        self._attr_media_episode = poll_speaker["media_episode"]
-        self._attr_media_season = poll_speaker["media_season"]
-        self._attr_media_track = poll_speaker["media_track"]
-        self._attr_media_series_title = poll_speaker["media_series_title"]
+        self._attr_app_id = player.app_id
+        self._attr_app_name = player.app_id
+        self._attr_media_content_id = player.content_id
+        self._attr_media_content_type = player.content_type
+
+        if player.image_url != self._attr_media_image_url:
+            if player.image_url is not None:
+                # Fetch new artwork before the first client asks for it.
+                self.hass.async_create_background_task(
+                    self._artwork.async_get(player.image_url), f"{DOMAIN} artwork {player.image_url}"
+                )
+            # The hash is kept for the whole track, even once the prefetch learnt the
+            # digest, so clients fetch the artwork of a track once.
+            self._attr_media_image_hash = self._artwork.image_hash(player.image_url)
+        self._attr_media_image_url = player.image_url
+        self._attr_media_title = player.title
+        self._attr_media_artist = player.artist
+        self._attr_media_album_name = player.album_name
+        self._attr_media_playlist = player.playlist
 
         if self._attr_state == MediaPlayerState.PLAYING:
-            self._attr_media_position_updated_at = dt_util.utcnow()
-            if poll_speaker["media_position"] is not None:
-                self._attr_media_position = poll_speaker["media_position"] / 1000
-            if poll_speaker["media_duration"] is not None:
-                self._attr_media_duration = poll_speaker["media_duration"] / 1000
+            # The position only changes when the playback clock was anchored again,
+            # in between the frontend extrapolates it.
+            clock = self._speaker.clock
+            if clock.synced_at is not None and clock.synced_at != self._position_synced_at:
+                self._position_synced_at = clock.synced_at
+                self._attr_media_position = clock.position / 1000
+                self._attr_media_position_updated_at = dt_util.utc_from_timestamp(clock.synced_at)
+            if player.duration is not None:
+                self._attr_media_duration = player.duration / 1000
         else:
             self._attr_media_duration = None
             self._attr_media_position = None
             self._attr_media_position_updated_at = None
+            self._position_synced_at = None
+
+
+    async def async_get_media_image(self) -> tuple[bytes | None, str | None]:
+        """Serve the current artwork from the artwork cache."""
+        if self._attr_media_image_url is None:
+            return None, None
+
+        artwork = await self._artwork.async_get(self._attr_media_image_url)
+        if artwork is None:
+            return None, None
+
+        return artwork.content, artwork.content_type
 
 
     async def async_turn_on(self) -> None:
         """Turn the media player on."""
-        await self._speaker.turn_on()
-
-        await asyncio.sleep(5)
-        self.async_schedule_update_ha_state(True)
+        await self._async_command(
+            self._speaker.turn_on(),
+            [PATH_PHYSICAL_SOURCE],
+            lambda snapshot: snapshot.source not in (None, "standby"),
+            {"_attr_state": MediaPlayerState.ON},
+            WAKE_UP_TIMEOUT,
+        )
 
 
     async def async_turn_off(self) -> None:
         """Turn the media player off."""
-        await self._speaker.turn_off()
-
-        await asyncio.sleep(5)
-        self.async_schedule_update_ha_state(True)
+        await self._async_command(
+            self._speaker.turn_off(),
+            [PATH_PHYSICAL_SOURCE],
+            lambda snapshot: snapshot.source == "standby",
+            {"_attr_state": MediaPlayerState.OFF, "_attr_source": "standby"},
+        )
 
 
     async def async_mute_volume(self, mute: bool) -> None:
         """Mute the volume."""
-        if mute:
-            await self._speaker.mute()
-        else:
-            await self._speaker.unmute()
+        await self._async_command(
+            self._speaker.mute() if mute else self._speaker.unmute(),
+            [PATH_MUTE],
+            lambda snapshot: snapshot.is_volume_muted == mute,
+            {"_attr_is_volume_muted": mute},
+        )
 
 
     async def async_set_volume_level(self, volume: float) -> None:
         """Set volume level, range 0..1."""
-        volume = int( min(volume, self._attr_volume_max) * 100)
-        await self._speaker.set_volume(volume)
+        await self._async_request_volume(volume)
 
 
     async def async_volume_up(self) -> None:
         """Turn volume up for media player."""
-        volume = int( min(self._attr_volume_level + self._attr_volume_step, self._attr_volume_max) * 100)
-        await self._speaker.set_volume(volume)
+        await self._async_request_volume(self._attr_volume_level + self._attr_volume_step)
 
 
     async def async_volume_down(self) -> None:
         """Turn volume down for media player."""
-        volume = int( min(self._attr_volume_level - self._attr_volume_step, self._attr_volume_max) * 100)
-        await self._speaker.set_volume(volume)
+        await self._async_request_volume(self._attr_volume_level - self._attr_volume_step)
+
+
+    async def _async_request_volume(self, volume: float) -> None:
+        """Show the new volume right away and let the speaker catch up."""
+        volume = int( round(max(0, min(volume, self._attr_volume_max)) * 100) )
+
+        self._attr_volume_level = volume / 100
+        self._written = None
+        self.async_write_ha_state()
+
+        await self._speaker.request_volume(volume)
 
 
     async def async_select_source(self, source: str) -> None:
         """Select input source."""
-        await self._speaker.set_source(source)
-
-        await asyncio.sleep(0.25)
-        self.async_schedule_update_ha_state(True)
+        await self._async_command(
+            self._speaker.set_source(source),
+            [PATH_PHYSICAL_SOURCE],
+            lambda snapshot: snapshot.source == source,
+            {"_attr_source": source},
+            WAKE_UP_TIMEOUT if self._attr_state == MediaPlayerState.OFF else CONFIRM_TIMEOUT,
+        )
 
 
     async def async_media_play_pause(self) -> None:
         """Play or pause the media player."""
-        await self._speaker.play_pause()
-
-        await asyncio.sleep(0.25)
-        self.async_schedule_update_ha_state(True)
+        if self._attr_state == MediaPlayerState.PLAYING:
+            await self.async_media_pause()
+        else:
+            await self.async_media_play()
 
 
     async def async_media_play(self) -> None:
         """Send play command."""
-        await self._speaker.play_pause()
+        if self._attr_state == MediaPlayerState.PLAYING:
+            return
 
-        await asyncio.sleep(0.25)
-        self.async_schedule_update_ha_state(True)
+        await self._async_command(
+            self._speaker.play_pause(),
+            MEDIA_PATHS,
+            lambda snapshot: snapshot.state == "playing",
+            {"_attr_state": MediaPlayerState.PLAYING},
+        )
 
 
     async def async_media_pause(self) -> None:
         """Send pause command."""
-        await self._speaker.play_pause()
+        if self._attr_state == MediaPlayerState.PAUSED:
+            return
+
+        await self._async_command(
+            self._speaker.play_pause(),
+            MEDIA_PATHS,
+            lambda snapshot: snapshot.state == "paused",
+            {"_attr_state": MediaPlayerState.PAUSED},
+        )
+
+
+    async def async_snapshot_scene(self) -> None:
+        """Save the source, volume, mute, play mode and power status of the speaker."""
+        self._scene = await self._speaker.snapshot()
+
+
+    async def async_restore_scene(self) -> None:
+        """Restore the saved scene, writing only what changed since."""
+        if self._scene is None:
+            raise ServiceValidationError(f"No scene of {self.name} was saved")
+
+        written = await self._speaker.restore(self._scene)
+        if written and not self.coordinator.subscribed:
+            # Speakers listening to their event queue push the change themselves.
+            self.hass.async_create_task(self.coordinator.async_request_refresh())
+
+
+    async def async_fade_volume(self, volume_level: float, duration: timedelta) -> None:
+        """Start fading the volume, a volume set or a new fade in the meantime ends it."""
+        self.hass.async_create_background_task(
+            self._async_fade(int(round(volume_level * 100)), duration.total_seconds()), f"{DOMAIN} fade {self.name}"
+        )
 
-        await asyncio.sleep(0.25)
-        self.async_schedule_update_ha_state(True)
+
+    async def _async_fade(self, volume: int, duration: float) -> None:
+        """Fade the volume and show where it ended."""
+        try:
+            await self._speaker.fade_to(volume, duration)
+        except CannotConnect as e:
+            _LOGGER.warning("Fading the volume of %s failed: %s", self.name, e)
+
+        if not self.coordinator.subscribed:
+            # Speakers listening to their event queue pushed every step.
+            await self.coordinator.async_request_refresh()
+
+
+    async def async_browse_media(
+        self,
+        media_content_type: MediaType | str | None = None,
+        media_content_id: str | None = None,
+    ) -> BrowseMedia:
+        """Browse a page of the browse tree of the speaker."""
+        return await async_browse_media(self._speaker, media_content_id)
+
+
+    async def async_play_media(self, media_type: MediaType | str, media_id: str, **kwargs: Any) -> None:
+        """Play an item of the browse tree or a media uri."""
+        if media_type == MEDIA_TYPE_ROW:
+            command = self._speaker.play_row(media_id)
+        else:
+            command = self._speaker.play_media(media_id)
+
+        await self._async_command(
+            command,
+            MEDIA_PATHS,
+            lambda snapshot: snapshot.state == "playing",
+            {"_attr_state": MediaPlayerState.PLAYING},
+        )
 
 
     async def async_media_next_track(self) -> None:
         """Send next track command."""
-        await self._speaker.next_track()
-
-        await asyncio.sleep(0.25)
-        self.async_schedule_update_ha_state(True)
+        await self._async_track_command(self._speaker.next_track())
 
 
     async def async_media_previous_track(self) -> None:
         """Send previous track command."""
-        await self._speaker.previous_track()
+        await self._async_track_command(self._speaker.previous_track())
+
+
+    async def _async_track_command(self, command: Coroutine) -> None:
+        """Send a command changing the track, the new track is not known in advance."""
+        track = self.coordinator.data.player.track if self.coordinator.data else None
+        await self._async_command(
+            command,
+            MEDIA_PATHS,
+            lambda snapshot: snapshot.player.track != track,
+        )
+
 
-        await asyncio.sleep(0.25)
-        self.async_schedule_update_ha_state(True)
+    async def _async_command(
+        self,
+        command: Coroutine,
+        paths: Iterable[str],
+        confirmed: Callable[[KefSnapshot], bool],
+        optimistic: dict[str, Any] | None = None,
+        timeout: float = CONFIRM_TIMEOUT,
+    ) -> None:
+        """Send a command, show its expected outcome and confirm it on the affected paths only.
+
+        The attributes in optimistic are applied right away. Once the speaker
+        confirms, the confirmed paths are shared with the coordinator, otherwise the
+        last known state is restored and a full refresh is requested.
+        """
+
+        for attribute, value in (optimistic or {}).items():
+            setattr(self, attribute, value)
+        self._written = None
+
+        self._confirming += 1
+        self.async_write_ha_state()
+
+        snapshot = None
+        try:
+            await command
+            snapshot = await self._speaker.wait_for(paths, confirmed, timeout)
+
+        finally:
+            self._confirming -= 1
+            if snapshot is None:
+                _LOGGER.debug("Command was not confirmed by %s, restoring last known state", self.name)
+                self._handle_coordinator_update()
+                self.hass.async_create_task(self.coordinator.async_request_refresh())
+
+        if snapshot is not None and self.coordinator.data is not None:
+            self.coordinator.async_set_updated_data(self.coordinator.data.merged(snapshot.values))
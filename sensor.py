@@ -0,0 +1,108 @@
+"""Diagnostic sensors of the requests sent to KEF LSX II speakers."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import format_mac
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import CONF_MAC_ADDRESS, DOMAIN
+from .coordinator import KefCoordinator
+from .entity import KefEntity
+
+
+@dataclass(frozen=True, kw_only=True)
+class KefSensorEntityDescription(SensorEntityDescription):
+    """Description of a request statistics sensor."""
+
+    value_fn: Callable[[dict[str, Any]], Any]
+
+
+SENSORS = (
+    KefSensorEntityDescription(
+        key="request_latency",
+        translation_key="request_latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats["latency_p95_ms"],
+    ),
+    KefSensorEntityDescription(
+        key="request_errors",
+        translation_key="request_errors",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats["errors"],
+    ),
+    KefSensorEntityDescription(
+        key="request_timeouts",
+        translation_key="request_timeouts",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats["timeouts"],
+    ),
+    KefSensorEntityDescription(
+        key="bytes_received",
+        translation_key="bytes_received",
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats["bytes_received"],
+    ),
+)
+
+
+async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities: AddEntitiesCallback,) -> None:
+    """Set up KEF LSX II diagnostic sensors from a config entry."""
+
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+    async_add_entities( [KefRequestSensor(coordinator, config_entry, description) for description in SENSORS] )
+
+
+class KefRequestSensor(KefEntity, SensorEntity):
+    """Statistics of the requests sent to a speaker, disabled by default."""
+
+    entity_description: KefSensorEntityDescription
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, coordinator: KefCoordinator, config_entry: ConfigEntry, description: KefSensorEntityDescription):
+        """Initialize sensor."""
+        super().__init__(coordinator, config_entry)
+        self.entity_description = description
+        self._attr_unique_id = "KEF_" + format_mac(config_entry.data[CONF_MAC_ADDRESS]) + "_" + description.key
+
+
+    @property
+    def available(self) -> bool:
+        """Statistics are available even while the speaker is not."""
+        return True
+
+
+    @property
+    def native_value(self) -> Any:
+        """Return the current value of the statistic."""
+        return self.entity_description.value_fn(self._speaker.stats_summary())
+
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the latency percentiles alongside the p95 latency."""
+        if self.entity_description.key != "request_latency":
+            return None
+
+        stats = self._speaker.stats_summary()
+        return {
+            "p50": stats["latency_p50_ms"],
+            "p99": stats["latency_p99_ms"],
+            "requests": stats["count"],
+        }
@@ -0,0 +1,115 @@
+"""Services of the KEF LSX II integration acting on several speakers at once."""
+
+from __future__ import annotations
+
+import logging
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv, entity_registry as er
+
+from .const import DOMAIN
+from .coordinator import KefCoordinator
+from .kef_connector import SOURCES, KefConnector, fan_out
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_GROUP_COMMAND = "group_command"
+
+ATTR_COMMAND = "command"
+ATTR_SOURCE = "source"
+ATTR_VOLUME_LEVEL = "volume_level"
+
+
+def _volume(coordinator: KefCoordinator, call: ServiceCall) -> int:
+    """Requested volume, capped at the maximum volume of the speaker like the entity does."""
+    volume = int(round(call.data[ATTR_VOLUME_LEVEL] * 100))
+    if coordinator.data is not None and coordinator.data.maximum_volume is not None:
+        volume = min(volume, coordinator.data.maximum_volume)
+    return volume
+
+
+COMMANDS = {
+    "turn_on": lambda coordinator, call: coordinator.speaker.turn_on(),
+    "turn_off": lambda coordinator, call: coordinator.speaker.turn_off(),
+    "select_source": lambda coordinator, call: coordinator.speaker.set_source(call.data[ATTR_SOURCE]),
+    # Through request_volume, which also ends a running fade.
+    "set_volume": lambda coordinator, call: coordinator.speaker.request_volume(_volume(coordinator, call)),
+    "mute": lambda coordinator, call: coordinator.speaker.mute(),
+    "unmute": lambda coordinator, call: coordinator.speaker.unmute(),
+}
+
+GROUP_COMMAND_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+    vol.Required(ATTR_COMMAND): vol.In(list(COMMANDS)),
+    vol.Optional(ATTR_SOURCE): vol.In(SOURCES),
+    vol.Optional(ATTR_VOLUME_LEVEL): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+})
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def async_group_command(call: ServiceCall) -> ServiceResponse:
+        """Send a command to the given speakers, or to all of them, at the same time."""
+
+        command = call.data[ATTR_COMMAND]
+        if command == "select_source" and ATTR_SOURCE not in call.data:
+            raise ServiceValidationError("select_source needs a source")
+        if command == "set_volume" and ATTR_VOLUME_LEVEL not in call.data:
+            raise ServiceValidationError("set_volume needs a volume_level")
+
+        coordinators = _coordinators(hass, call.data.get(ATTR_ENTITY_ID))
+        if not coordinators:
+            raise ServiceValidationError("No KEF speaker matches the given entities")
+
+        by_speaker = { coordinator.speaker: coordinator for coordinator in coordinators }
+
+        def send(speaker: KefConnector):
+            return COMMANDS[command](by_speaker[speaker], call)
+
+        result = await fan_out(by_speaker, send)
+        _LOGGER.debug(
+            "%s sent to %d speakers in %.0f ms, %.0f ms apart",
+            command, len(coordinators), result.duration * 1000, result.spread * 1000,
+        )
+
+        for coordinator in coordinators:
+            if not coordinator.subscribed:
+                # Speakers listening to their event queue push the change themselves.
+                hass.async_create_task(coordinator.async_request_refresh())
+
+        return {
+            "speakers": len(coordinators),
+            "duration_ms": round(result.duration * 1000, 1),
+            "spread_ms": round(result.spread * 1000, 1),
+            "failed": { host: str(error) for host, error in result.errors.items() },
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GROUP_COMMAND,
+        async_group_command,
+        schema=GROUP_COMMAND_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def _coordinators(hass: HomeAssistant, entity_ids: list[str] | None) -> list[KefCoordinator]:
+    """Coordinators of the speakers of the given entities, all of them without entities."""
+
+    coordinators: dict[str, KefCoordinator] = hass.data.get(DOMAIN, {})
+    if entity_ids is None:
+        return list(coordinators.values())
+
+    registry = er.async_get(hass)
+    entry_ids = []
+    for entity_id in entity_ids:
+        entity = registry.async_get(entity_id)
+        if entity is not None and entity.config_entry_id in coordinators:
+            entry_ids.append(entity.config_entry_id)
+
+    return [ coordinators[entry_id] for entry_id in dict.fromkeys(entry_ids) ]
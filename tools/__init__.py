@@ -0,0 +1 @@
+"""Development tools for the KEF LSX II integration, not loaded by Home Assistant."""
@@ -0,0 +1,187 @@
+"""Benchmark of the refresh cycle of KEF speakers against emulated speakers.
+
+Measures, per scenario and fleet size, the HTTP requests and bytes of one refresh,
+the refresh latency and the lag it causes on the event loop. The emulated speakers
+share the event loop, absolute numbers are an upper bound. Run from the directory
+containing the integration:
+
+    python -m kef_speaker.tools.benchmark --speakers 1 10 50 200 --cycles 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+import json
+import statistics
+import sys
+import time
+
+from ..exceptions import CannotConnect
+from ..kef_connector import KefConnector
+from .emulator import Faults, KefEmulator
+
+SCENARIOS = [ "playing", "paused", "standby", "unreachable" ]
+
+# Seconds between two samples of the event loop lag.
+LAG_SAMPLE_INTERVAL = 0.005
+
+
+@dataclass
+class Result:
+    """Measurements of one scenario and fleet size."""
+
+    scenario: str
+    speakers: int
+    requests_per_refresh: float
+    bytes_per_refresh: float
+    latency_p50: float
+    latency_p95: float
+    latency_max: float
+    cycle_time: float
+    loop_lag_p99: float
+    loop_lag_max: float
+    failures: int
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def _sample_lag(lags: list[float], stop: asyncio.Event) -> None:
+    """Record how late the event loop wakes a sleeping task."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+        lags.append(max(0, loop.time() - start - LAG_SAMPLE_INTERVAL))
+
+
+async def _start_fleet(scenario: str, count: int) -> list[KefEmulator]:
+    emulators = []
+    for index in range(count):
+        emulator = KefEmulator(
+            name=f"Bench {index}",
+            mac_address=f"00:00:00:00:{index // 256:02x}:{index % 256:02x}",
+            standby=scenario == "standby",
+            faults=Faults(offline=scenario == "unreachable"),
+        )
+        if scenario in ("playing", "paused"):
+            emulator.play(index)
+        if scenario == "paused":
+            emulator.pause()
+        await emulator.start()
+        emulators.append(emulator)
+
+    return emulators
+
+
+async def _refresh(speaker: KefConnector, previous, latencies: list[float]):
+    """Run one refresh cycle of a speaker, the way the coordinator and the entity do."""
+    start = time.perf_counter()
+    try:
+        snapshot = await speaker.fetch_update(previous)
+        # Parsing done by the media player entity on every update.
+        snapshot.player
+    except CannotConnect:
+        snapshot = None
+    latencies.append(time.perf_counter() - start)
+    return snapshot
+
+
+async def run_scenario(scenario: str, count: int, cycles: int, timeout: float) -> Result:
+    """Refresh a fleet of emulated speakers and measure the cost of a refresh."""
+
+    emulators = await _start_fleet(scenario, count)
+    # Every speaker opens its own connection pool, as in the integration. Cycles follow
+    # each other faster than real refreshes, the read cache would hide their requests.
+    speakers = [ KefConnector(f"127.0.0.1:{emulator.port}", timeout=timeout, cache_ttl=0) for emulator in emulators ]
+
+    try:
+        # The first refresh has no previous state, it is not representative.
+        snapshots = await asyncio.gather(*(_refresh(speaker, None, []) for speaker in speakers))
+
+        requests = sum(emulator.requests for emulator in emulators)
+        transferred = sum(emulator.bytes_received + emulator.bytes_sent for emulator in emulators)
+
+        latencies, lags, cycle_times = [], [], []
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(_sample_lag(lags, stop))
+
+        for _ in range(cycles):
+            start = time.perf_counter()
+            snapshots = await asyncio.gather(*(
+                _refresh(speaker, previous, latencies) for speaker, previous in zip(speakers, snapshots)
+            ))
+            cycle_times.append(time.perf_counter() - start)
+
+        stop.set()
+        await sampler
+
+    finally:
+        await asyncio.gather(*(speaker.close_session() for speaker in speakers))
+        await asyncio.gather(*(emulator.stop() for emulator in emulators))
+
+    refreshes = count * cycles
+    return Result(
+        scenario=scenario,
+        speakers=count,
+        requests_per_refresh=(sum(emulator.requests for emulator in emulators) - requests) / refreshes,
+        bytes_per_refresh=(sum(emulator.bytes_received + emulator.bytes_sent for emulator in emulators) - transferred) / refreshes,
+        latency_p50=_percentile(latencies, 50),
+        latency_p95=_percentile(latencies, 95),
+        latency_max=max(latencies),
+        cycle_time=statistics.mean(cycle_times),
+        loop_lag_p99=_percentile(lags, 99),
+        loop_lag_max=max(lags, default=0),
+        failures=sum(snapshot is None for snapshot in snapshots),
+    )
+
+
+def _print_table(results: list[Result]) -> None:
+    print(f"{'scenario':<12}{'speakers':>9}{'req/refresh':>13}{'bytes/refresh':>15}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'cycle ms':>10}{'lag p99 ms':>12}{'lag max ms':>12}{'failed':>8}")
+    for result in results:
+        print(f"{result.scenario:<12}{result.speakers:>9}{result.requests_per_refresh:>13.1f}{result.bytes_per_refresh:>15.0f}"
+              f"{result.latency_p50 * 1000:>9.1f}{result.latency_p95 * 1000:>9.1f}{result.cycle_time * 1000:>10.1f}"
+              f"{result.loop_lag_p99 * 1000:>12.1f}{result.loop_lag_max * 1000:>12.1f}{result.failures:>8}")
+
+
+async def _main(args: argparse.Namespace) -> int:
+    results = []
+    for scenario in args.scenarios:
+        for count in args.speakers:
+            results.append(await run_scenario(scenario, count, args.cycles, args.timeout))
+
+    if args.json:
+        print(json.dumps([asdict(result) for result in results], indent=2))
+    else:
+        _print_table(results)
+
+    if args.max_requests is not None:
+        exceeded = [ result for result in results if result.scenario != "unreachable" and result.requests_per_refresh > args.max_requests ]
+        for result in exceeded:
+            print(f"{result.scenario} with {result.speakers} speakers: {result.requests_per_refresh:.1f} requests per refresh", file=sys.stderr)
+        return 1 if exceeded else 0
+
+    return 0
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--speakers", nargs="+", type=int, default=[1, 10, 50, 200])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=1, help="request timeout, bounds the unreachable scenario")
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    parser.add_argument("--max-requests", type=float, default=None, help="fail if a refresh needs more requests")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Command line client of KEF LS50 Wireless II, LSX II and LS60 speakers.
+
+Only needs aiohttp, Home Assistant is not imported. Run from the directory
+containing the integration:
+
+    python -m kef_speaker.tools.cli 192.168.1.20 status
+    python -m kef_speaker.tools.cli 192.168.1.20 watch
+    python -m kef_speaker.tools.cli 192.168.1.20 volume 25
+    python -m kef_speaker.tools.cli 192.168.1.20 source tv
+    python -m kef_speaker.tools.cli 192.168.1.20 get settings:/deviceName
+
+Exits with 1 if the speaker cannot be reached, for use in scripts and probes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+
+from ..exceptions import CannotConnect
+from ..kef_connector import (
+    EVENT_PATHS,
+    IDENTITY_PATHS,
+    SOURCES,
+    UPDATE_PATHS,
+    KefConnector,
+    KefSnapshot,
+)
+
+# Seconds the speaker holds a poll of the event queue open while watching.
+WATCH_POLL_TIMEOUT = 10
+
+
+def _status(snapshot: KefSnapshot) -> dict:
+    """Summary of the state of a speaker."""
+    player = snapshot.player
+    return {
+        "name": snapshot.device_name,
+        "model": snapshot.model,
+        "firmware_version": snapshot.firmware_version,
+        "source": snapshot.source,
+        "state": snapshot.state,
+        "volume": snapshot.volume_level,
+        "maximum_volume": snapshot.maximum_volume,
+        "muted": snapshot.is_volume_muted,
+        "title": player.title,
+        "artist": player.artist,
+        "album": player.album_name,
+    }
+
+
+def _print(data: dict, as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(data))
+    else:
+        for key, value in data.items():
+            if value is not None:
+                print(f"{key:<18}{value}")
+
+
+async def _status_command(speaker: KefConnector, args: argparse.Namespace) -> None:
+    snapshot = await speaker.fetch_snapshot((*IDENTITY_PATHS, *UPDATE_PATHS))
+    _print(_status(snapshot), args.json)
+
+
+async def _watch_command(speaker: KefConnector, args: argparse.Namespace) -> None:
+    await speaker.subscribe(EVENT_PATHS)
+    while True:
+        for path, value in (await speaker.poll_events(WATCH_POLL_TIMEOUT)).items():
+            print(json.dumps({"path": path, "value": value}) if args.json else f"{path:<40}{json.dumps(value)}", flush=True)
+
+
+async def _volume_command(speaker: KefConnector, args: argparse.Namespace) -> None:
+    await speaker.set_volume(args.volume)
+
+
+async def _source_command(speaker: KefConnector, args: argparse.Namespace) -> None:
+    if args.source == "standby":
+        await speaker.turn_off()
+    else:
+        await speaker.set_source(args.source)
+
+
+async def _get_command(speaker: KefConnector, args: argparse.Namespace) -> None:
+    snapshot = await speaker.fetch_snapshot([args.path])
+    print(json.dumps(snapshot.value(args.path), indent=None if args.json else 2))
+
+
+async def _main(args: argparse.Namespace) -> int:
+    speaker = KefConnector(args.host, timeout=args.timeout)
+    try:
+        await args.command(speaker, args)
+    except CannotConnect as e:
+        print(f"{args.host}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        await speaker.close_session()
+
+    return 0
+
+
+def main() -> None:
+    """Run the client from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("host", help="host of the speaker, with an optional port")
+    parser.add_argument("--timeout", type=float, default=5, help="seconds to wait for each request")
+    parser.add_argument("--json", action="store_true", help="print machine readable output")
+    commands = parser.add_subparsers(required=True)
+
+    commands.add_parser("status", help="print the state of the speaker").set_defaults(command=_status_command)
+    commands.add_parser("watch", help="print changes pushed by the speaker").set_defaults(command=_watch_command)
+
+    volume = commands.add_parser("volume", help="set the volume")
+    volume.add_argument("volume", type=int, choices=range(101), metavar="0-100")
+    volume.set_defaults(command=_volume_command)
+
+    source = commands.add_parser("source", help="select a source, standby turns the speaker off")
+    source.add_argument("source", choices=(*SOURCES, "standby"))
+    source.set_defaults(command=_source_command)
+
+    get = commands.add_parser("get", help="print the raw value of a path")
+    get.add_argument("path")
+    get.set_defaults(command=_get_command)
+
+    try:
+        sys.exit(asyncio.run(_main(parser.parse_args())))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,578 @@
+"""Emulator of the HTTP API of KEF LS50 Wireless II, LSX II and LS60 speakers.
+
+Serves /api/getData, /api/setData, /api/getRows and the event queue with the JSON
+shapes of the real firmware, and placeholder artwork, with configurable latency and
+faults.
+
+    python -m tools.emulator --count 3 --port 8080 --latency 0.05 --drop-rate 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
+import json
+import random
+import time
+import uuid
+
+from aiohttp import web
+
+SOURCES = [ "wifi", "bluetooth", "tv", "optical", "usb", "analog" ]
+
+TRACKS = [
+    {"title": "Emulated Track One", "artist": "Emulator", "album": "Loopback", "duration": 215000},
+    {"title": "Emulated Track Two", "artist": "Emulator", "album": "Loopback", "duration": 187000},
+    {"title": "Emulated Track Three", "artist": "Emulator", "album": "Loopback", "duration": 243000},
+]
+
+# Presets of the browse tree, the UPnP library holds library_size generated tracks.
+PRESETS = [ "Emulated Radio One", "Emulated Radio Two", "Emulated Radio Three" ]
+
+
+@dataclass
+class Faults:
+    """Faults injected into the responses of an emulated speaker."""
+
+    # Seconds added to every response, plus a uniform random jitter.
+    latency: float = 0
+    jitter: float = 0
+
+    # Probabilities of closing the connection without answering and of
+    # answering with truncated JSON.
+    drop_rate: float = 0
+    malformed_rate: float = 0
+
+    # Never answer at all, like an unplugged speaker.
+    offline: bool = False
+
+
+class KefEmulator:
+    """Emulated KEF speaker."""
+
+    def __init__(
+        self,
+        name: str = "Emulated LSX II",
+        mac_address: str = "00:00:00:00:00:01",
+        release_text: str = "LSXII_V26120",
+        faults: Faults | None = None,
+        standby: bool = False,
+        auto_standby: float | None = None,
+        wake_delay: float = 0,
+        seed: int | None = None,
+        library_size: int = 20000,
+    ):
+        """Initialize emulator.
+
+        auto_standby: seconds without playback after which the speaker goes to standby.
+        wake_delay: seconds a source change out of standby takes to apply.
+        library_size: tracks in the emulated UPnP library.
+        """
+        self.faults = faults or Faults()
+        self._random = random.Random(seed)
+        self._auto_standby = auto_standby
+        self._wake_delay = wake_delay
+        self._library_size = library_size
+
+        self.requests = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.path_counts = Counter()
+
+        self._values = {
+            "settings:/system/primaryMacAddress": {"type": "string_", "string_": mac_address},
+            "settings:/deviceName": {"type": "string_", "string_": name},
+            "settings:/releasetext": {"type": "string_", "string_": release_text},
+            "settings:/kef/play/physicalSource": {"type": "kefPhysicalSource", "kefPhysicalSource": "standby" if standby else "wifi"},
+            "settings:/kef/host/speakerStatus": {"type": "kefSpeakerStatus", "kefSpeakerStatus": "standby" if standby else "powerOn"},
+            "player:volume": {"type": "i32_", "i32_": 30},
+            "settings:/kef/host/volumeStep": {"type": "i16_", "i16_": 3},
+            "settings:/kef/host/volumeLimit": {"type": "bool_", "bool_": "False"},
+            "settings:/kef/host/maximumVolume": {"type": "i32_", "i32_": 100},
+            "settings:/mediaPlayer/mute": {"type": "bool_", "bool_": "False"},
+            "settings:/mediaPlayer/playMode": {"type": "playerPlayMode", "playerPlayMode": "normal"},
+        }
+
+        self._state = "stopped"
+        self._track = 0
+        self._position = 0
+        self._started_at = None
+        self._idle_since = time.monotonic()
+        self._pending_source = None
+
+        self._queues: dict[str, set[str]] = {}
+        self._changes: dict[str, set[str]] = {}
+        self._changed: dict[str, asyncio.Event] = {}
+
+        self._runner = None
+        self._stopping = asyncio.Event()
+        self.port = None
+
+
+    # Playback model.
+
+    def play(self, track: int | None = None) -> None:
+        """Start playing a track from the emulated library."""
+        if track is not None:
+            self._track = track % len(TRACKS)
+            self._position = 0
+        if self.source == "standby":
+            self._apply_source("wifi")
+        self._state = "playing"
+        self._started_at = time.monotonic()
+        self._notify("player:player/data")
+
+
+    def pause(self) -> None:
+        """Pause playback."""
+        self._position = self.play_time
+        self._state = "paused"
+        self._started_at = None
+        self._idle_since = time.monotonic()
+        self._notify("player:player/data")
+
+
+    def stop_playback(self) -> None:
+        """Stop playback."""
+        self._state = "stopped"
+        self._position = 0
+        self._started_at = None
+        self._idle_since = time.monotonic()
+        self._notify("player:player/data")
+
+
+    def standby(self) -> None:
+        """Put the speaker in standby."""
+        self._apply_source("standby")
+
+
+    def wake(self, source: str = "wifi") -> None:
+        """Wake the speaker up on a source."""
+        self._apply_source(source)
+
+
+    def set_value(self, path: str, value: dict) -> None:
+        """Change the value of a path as if changed on the speaker itself."""
+        self._values[path] = value
+        self._notify(path)
+
+
+    @property
+    def source(self) -> str:
+        """Current physical source."""
+        return self._values["settings:/kef/play/physicalSource"]["kefPhysicalSource"]
+
+
+    @property
+    def state(self) -> str:
+        """Current play state."""
+        return self._state
+
+
+    @property
+    def play_time(self) -> int:
+        """Position in the current track in milliseconds."""
+        position = self._position
+        if self._started_at is not None:
+            position += int((time.monotonic() - self._started_at) * 1000)
+
+        duration = TRACKS[self._track]["duration"]
+        if position >= duration:
+            # Continue with the next track of the library.
+            self._track = (self._track + 1) % len(TRACKS)
+            self._position = 0
+            self._started_at = time.monotonic()
+            self._notify("player:player/data")
+            position = 0
+
+        return position
+
+
+    def _apply_source(self, source: str) -> None:
+        """Switch the physical source, standby included."""
+        if source == "standby":
+            self.stop_playback()
+        self._values["settings:/kef/play/physicalSource"] = {"type": "kefPhysicalSource", "kefPhysicalSource": source}
+        self._values["settings:/kef/host/speakerStatus"] = {"type": "kefSpeakerStatus", "kefSpeakerStatus": "standby" if source == "standby" else "powerOn"}
+        self._idle_since = time.monotonic()
+        self._notify("settings:/kef/play/physicalSource", "settings:/kef/host/speakerStatus")
+
+
+    def _check_auto_standby(self) -> None:
+        """Go to standby after a while without playback."""
+        if (
+            self._auto_standby is not None
+            and self._state != "playing"
+            and self.source != "standby"
+            and time.monotonic() - self._idle_since > self._auto_standby
+        ):
+            self.standby()
+
+
+    def _player_data(self) -> dict:
+        """Value of player:player/data in the shape of the firmware."""
+
+        if self.source == "standby" or self._state == "stopped":
+            return {"state": "stopped", "controls": {}, "mediaRoles": {}, "trackRoles": {}}
+
+        track = TRACKS[self._track]
+        return {
+            "state": self._state,
+            "status": {"duration": track["duration"], "playSpeed": 1 if self._state == "playing" else 0},
+            "trackRoles": {
+                "id": f"emulator:track/{self._track}",
+                "title": track["title"],
+                "icon": f"http://{self._host}/artwork/{self._track}.jpg",
+                "type": "audio",
+                "mediaData": {
+                    "metaData": {"artist": track["artist"], "album": track["album"], "serviceID": "emulator"},
+                    "resources": [{"mimeType": "audio/flac", "uri": f"emulator:track/{self._track}.flac"}],
+                },
+            },
+            "mediaRoles": {
+                "id": "emulator:playlist",
+                "title": "Emulated Playlist",
+                "type": "container",
+                "mediaData": {
+                    "metaData": {"serviceID": "emulator"},
+                    "resources": [{"mimeType": "audio/x-emulator"}],
+                },
+            },
+            "controls": {
+                "pause": True,
+                "next_": True,
+                "previous": True,
+                "seekTime": True,
+                "playMode": {"repeatAll": True, "repeatOne": True, "shuffle": True, "shuffleRepeatAll": True, "shuffleRepeatOne": True},
+            },
+        }
+
+
+    @property
+    def _host(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+
+    def _value(self, path: str) -> dict | None:
+        """Current value of a path."""
+        self._check_auto_standby()
+        if path == "player:player/data":
+            return self._player_data()
+        if path == "player:player/data/playTime":
+            return {"type": "i64_", "i64_": self.play_time if self._state != "stopped" else 0}
+        return self._values.get(path)
+
+
+    # Browse tree.
+
+    def _children(self, path: str) -> tuple[str, int, Callable[[int], dict]] | None:
+        """Title, number of rows and row factory of a node of the browse tree."""
+        match path:
+            case "ui:":
+                return "KEF", 2, lambda index: [
+                    {"title": "Presets", "path": "ui:/presets", "type": "container"},
+                    {"title": "UPnP", "path": "ui:/upnp", "type": "container"},
+                ][index]
+            case "ui:/presets":
+                return "Presets", len(PRESETS), lambda index: self._row(f"ui:/presets/{index}")
+            case "ui:/upnp":
+                return "UPnP", self._library_size, lambda index: self._row(f"ui:/upnp/{index}")
+        return None
+
+
+    def _row(self, path: str) -> dict | None:
+        """Roles of a playable row of the browse tree."""
+        node, _, index = path.rpartition("/")
+        if not index.isdigit():
+            return None
+
+        index = int(index)
+        if node == "ui:/presets" and index < len(PRESETS):
+            title = PRESETS[index]
+        elif node == "ui:/upnp" and index < self._library_size:
+            title = f"Emulated Library Track {index + 1}"
+        else:
+            return None
+
+        return {
+            "title": title,
+            "path": path,
+            "type": "audio",
+            "icon": f"http://{self._host}/artwork/{index % len(TRACKS)}.jpg",
+            "mediaData": {"metaData": {"serviceID": "emulator"}, "resources": [{"uri": f"emulator:{path}"}]},
+        }
+
+
+    # Event queue.
+
+    def _notify(self, *paths: str) -> None:
+        """Record changed paths for every queue subscribed to them."""
+        for queue_id, subscribed in self._queues.items():
+            self._changes[queue_id].update(path for path in paths if path in subscribed)
+            if self._changes[queue_id]:
+                self._changed[queue_id].set()
+
+
+    # HTTP handlers.
+
+    async def _handle_get_data(self, request: web.Request) -> web.Response:
+        path = request.query.get("path", "")
+        if request.query.get("roles") == "@all" and (row := self._row(path)) is not None:
+            return self._json([row])
+
+        value = self._value(path)
+        if value is None:
+            return self._json({"error": {"message": f"Path {path} not found"}}, status=500)
+        return self._json([value])
+
+
+    async def _handle_set_data(self, request: web.Request) -> web.Response:
+        path = request.query.get("path", "")
+        try:
+            value = json.loads(request.query.get("value", ""))
+        except ValueError:
+            return self._json({"error": {"message": "Invalid value"}}, status=500)
+
+        if path == "player:player/control":
+            self._control(value)
+            return self._json([])
+
+        if path not in self._values:
+            return self._json({"error": {"message": f"Path {path} not found"}}, status=500)
+
+        type_ = value.get("type")
+        data = value.get(type_)
+        if type_ in ("i16_", "i32_", "i64_"):
+            data = int(data)
+        value = {"type": type_, type_: data}
+
+        if path == "player:volume":
+            maximum = self._values["settings:/kef/host/maximumVolume"]["i32_"]
+            value["i32_"] = max(0, min(data, maximum))
+
+        if path == "settings:/kef/play/physicalSource":
+            source = value["kefPhysicalSource"]
+            if self.source == "standby" and source != "standby" and self._wake_delay:
+                self._pending_source = source
+                asyncio.get_event_loop().call_later(self._wake_delay, self._apply_pending_source)
+            else:
+                self._apply_source(source)
+            return self._json([])
+
+        if path == "settings:/kef/host/speakerStatus":
+            self._apply_source("standby" if value["kefSpeakerStatus"] == "standby" else "wifi")
+            return self._json([])
+
+        self.set_value(path, value)
+        return self._json([])
+
+
+    async def _handle_get_rows(self, request: web.Request) -> web.Response:
+        path = request.query.get("path", "")
+        children = self._children(path)
+        if children is None:
+            return self._json({"error": {"message": f"Path {path} not found"}}, status=500)
+
+        title, count, row = children
+        try:
+            start = max(0, int(request.query.get("from", 0)))
+            end = min(count, int(request.query.get("to", count)))
+        except ValueError:
+            return self._json({"error": {"message": "Invalid range"}}, status=500)
+
+        return self._json({
+            "roles": {"title": title, "path": path, "type": "container"},
+            "rowsCount": count,
+            "rowsVersion": 1,
+            "rows": [ row(index) for index in range(start, end) ],
+        })
+
+
+    def _apply_pending_source(self) -> None:
+        if self._pending_source is not None:
+            self._apply_source(self._pending_source)
+            self._pending_source = None
+
+
+    def _control(self, value: dict) -> None:
+        """Apply a player:player/control command."""
+        match value.get("control"):
+            case "pause":
+                if self._state == "playing":
+                    self.pause()
+                else:
+                    self.play()
+            case "next":
+                self.play(self._track + 1)
+            case "previous":
+                self.play(self._track - 1)
+            case "seekTime":
+                self._position = int(value.get("time", 0))
+                if self._started_at is not None:
+                    self._started_at = time.monotonic()
+                self._notify("player:player/data")
+            case "play":
+                path = (value.get("mediaRoles") or {}).get("path", "")
+                index = path.rpartition("/")[2]
+                self.play(int(index) if index.isdigit() else 0)
+
+
+    async def _handle_modify_queue(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            return self._json({"error": {"message": "Invalid body"}}, status=500)
+
+        queue_id = "{" + str(uuid.uuid4()) + "}"
+        self._queues[queue_id] = {item["path"] for item in body.get("subscribe", [])}
+        self._changes[queue_id] = set()
+        self._changed[queue_id] = asyncio.Event()
+        return self._json(queue_id)
+
+
+    async def _handle_poll_queue(self, request: web.Request) -> web.Response:
+        queue_id = request.query.get("queueId", "")
+        if queue_id not in self._queues:
+            return self._json({"error": {"message": "Queue not found"}}, status=500)
+
+        timeout = float(request.query.get("timeout", 10))
+        try:
+            await asyncio.wait_for(self._changed[queue_id].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        paths, self._changes[queue_id] = self._changes[queue_id], set()
+        self._changed[queue_id].clear()
+        return self._json([ {"path": path, "itemType": "update", "itemValue": self._value(path)} for path in paths ])
+
+
+    async def _handle_artwork(self, request: web.Request) -> web.Response:
+        """Placeholder image of a track, revalidated by its ETag."""
+        name = request.match_info["name"]
+        etag = f'"{name}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        body = f"emulated artwork {name}".encode() * 256
+        return web.Response(body=body, content_type="image/jpeg", headers={"ETag": etag})
+
+
+    def _json(self, data, status: int = 200) -> web.Response:
+        return web.Response(text=json.dumps(data), status=status, content_type="application/json")
+
+
+    @web.middleware
+    async def _faults_middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        """Count requests and inject the configured faults."""
+
+        self.requests += 1
+        self.bytes_received += len(request.raw_path) + (request.content_length or 0)
+        self.path_counts[request.query.get("path", request.path)] += 1
+
+        if self.faults.offline:
+            # Hold the connection until the client gives up or the emulator stops.
+            await self._stopping.wait()
+            # The client has usually given up and closed the connection by now.
+            raise web.HTTPServiceUnavailable()
+
+        delay = self.faults.latency + self._random.uniform(0, self.faults.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self._random.random() < self.faults.drop_rate:
+            request.transport.close()
+            return web.Response()
+
+        response = await handler(request)
+
+        if (
+            request.path.startswith("/api/")
+            and request.path != "/api/event/pollQueue"
+            and self._random.random() < self.faults.malformed_rate
+        ):
+            response = web.Response(text=response.text[: len(response.text) // 2], content_type="application/json")
+
+        self.bytes_sent += len(response.body or b"")
+        return response
+
+
+    def make_app(self) -> web.Application:
+        """Create the web application serving the API of the speaker."""
+        app = web.Application(middlewares=[self._faults_middleware])
+        app.router.add_get("/api/getData", self._handle_get_data)
+        app.router.add_get("/api/setData", self._handle_set_data)
+        app.router.add_get("/api/getRows", self._handle_get_rows)
+        app.router.add_post("/api/event/modifyQueue", self._handle_modify_queue)
+        app.router.add_get("/api/event/pollQueue", self._handle_poll_queue)
+        app.router.add_get("/artwork/{name}", self._handle_artwork)
+        return app
+
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the host:port to pass to KefConnector."""
+        self._stopping.clear()
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.port = self._runner.addresses[0][1]
+        return f"{host}:{self.port}"
+
+
+    async def stop(self) -> None:
+        """Stop serving, releasing the connections held while offline."""
+        self._stopping.set()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    faults = Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        drop_rate=args.drop_rate,
+        malformed_rate=args.malformed_rate,
+    )
+
+    for index in range(args.count):
+        emulator = KefEmulator(
+            name=f"Emulated LSX II {index + 1}",
+            mac_address=f"00:00:00:00:{(index + 1) // 256:02x}:{(index + 1) % 256:02x}",
+            faults=faults,
+            standby=args.standby,
+            auto_standby=args.auto_standby,
+            wake_delay=args.wake_delay,
+            seed=None if args.seed is None else args.seed + index,
+        )
+        if not args.standby:
+            emulator.play(index)
+        print("Serving", await emulator.start(args.host, args.port + index if args.port else 0))
+
+    await asyncio.Event().wait()
+
+
+def main() -> None:
+    """Run emulated speakers until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="first port, consecutive ports for more speakers")
+    parser.add_argument("--count", type=int, default=1, help="number of speakers")
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--drop-rate", type=float, default=0)
+    parser.add_argument("--malformed-rate", type=float, default=0)
+    parser.add_argument("--standby", action="store_true", help="start in standby")
+    parser.add_argument("--auto-standby", type=float, default=None)
+    parser.add_argument("--wake-delay", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()